@@ -2,13 +2,28 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
 from pydantic import BaseModel
 from pathlib import Path
-import json, subprocess, sys, tempfile, shutil, os
+import json, subprocess, tempfile, shutil, os
+import codecs
+import copy
+import datetime
+import glob
+import hashlib
 import io
-from typing import Any, Dict, Optional
+import threading
+import zipfile
+from collections import OrderedDict
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from sqlalchemy.orm import Session
 from wallet_api import router as wallet_router
 from webhooks_razorpay import router as razorpay_webhook_router
@@ -16,6 +31,11 @@ from routes_bos_auth import router as bos_auth_router
 
 import re
 
+try:
+    import fitz  # PyMuPDF (MuPDF C engine); primary PDF text extractor
+except Exception:
+    fitz = None  # type: ignore
+
 try:
     from pypdf import PdfReader
 except Exception:
@@ -26,6 +46,16 @@ try:
 except Exception:
     docx = None  # type: ignore
 
+try:
+    from lxml import etree as _xml_etree  # C iterparse for DOCX; stdlib is the fallback
+except Exception:
+    import xml.etree.ElementTree as _xml_etree
+
+try:
+    from python_calamine import CalamineWorkbook  # Rust XLSX reader; openpyxl is the fallback
+except Exception:
+    CalamineWorkbook = None  # type: ignore
+
 try:
     import openpyxl
 except Exception:
@@ -33,6 +63,11 @@ except Exception:
 
 import csv
 
+try:
+    from charset_normalizer import from_bytes as detect_charset
+except Exception:
+    detect_charset = None
+
 try:
     import pdfplumber
 except Exception:
@@ -48,6 +83,21 @@ try:
 except Exception:
     Image = None
 
+try:
+    import tesserocr  # in-process tesseract engine; pytesseract/CLI are the fallback
+except Exception:
+    tesserocr = None
+
+try:
+    import ijson  # streaming JSON parser for packet uploads
+except Exception:
+    ijson = None
+
+try:
+    import diskcache  # optional: extraction cache shared across workers
+except Exception:
+    diskcache = None
+
 
 from wallet import (
     CreditWallet,
@@ -57,14 +107,23 @@ from wallet import (
     get_balance,
     get_or_create_wallet,
     apply_credit_topup,
-    InsufficientCreditsError,
 )
 
 from db import SessionLocal
 from tier_config import TIER_CONFIG
-from bos_credits import charge_bos_run
+from bos_credits import reserve_bos_run, refund_bos_run
+from slm.config import load_config
+from slm.run_slm import (
+    run as slm_run,
+    worker_init as slm_worker_init,
+    worker_run as slm_worker_run,
+    worker_ready as slm_worker_ready,
+)
+from slm import orchestrate
+from slm.core.slm_core import close_session, warm_model
+from rate_limit import rate_limit, init_rate_limiter, close_rate_limiter
 
-app = FastAPI(title="CAIO BOS – EA API")
+app = FastAPI(title="CAIO BOS – EA API", default_response_class=ORJSONResponse)
 
 # Wallet + Payments routers MUST be included first
 app.include_router(wallet_router)
@@ -74,14 +133,26 @@ app.include_router(bos_auth_router, tags=["bos-auth"])
 PRIMARY_EA_MODEL = "qwen2.5:3b-instruct"
 FALLBACK_EA_MODEL = "qwen2.5:1.5b-instruct"
 
+# The former api.main service took {"packet", "overrides"} on /run-ea, with
+# no user_id and no billing, and answered with the {"ui", "per_brain"}
+# bundle; the Streamlit client still sends that body.
+LEGACY_EA_MIN_PREDICT = 384
+
 # -------------------- Models --------------------
+class Overrides(BaseModel):
+    model: Optional[str] = None
+    timeout_sec: Optional[int] = None
+    num_predict: Optional[int] = None
+
 class EARequest(BaseModel):
     packet: dict
-    user_id: int
+    # None only in the legacy {"packet", "overrides"} body (see _is_legacy_ea)
+    user_id: Optional[int] = None
     plan_tier: str = "demo"
     model: Optional[str] = None
     timeout_sec: int = 300
     num_predict: int = 512
+    overrides: Optional[Overrides] = None
 
 class BrainRequest(BaseModel):
     packet: dict
@@ -92,6 +163,74 @@ class BrainRequest(BaseModel):
     num_predict: int = 512
     brain: str
 
+# -------------------- Body size limits --------------------
+# JSON packet endpoints and their largest accepted body. The body is counted
+# as it streams in (chunked requests included) and rejected with 413 before
+# FastAPI parses it; under the cap it is replayed to the app unchanged.
+MAX_PACKET_BYTES = 1_200_000
+_BODY_LIMITS = {
+    "/run-ea": MAX_PACKET_BYTES,
+    "/run-ea-stream": MAX_PACKET_BYTES,
+}
+_TOO_LARGE = orjson.dumps({"detail": "Packet too large"})
+
+class BodyLimitMiddleware:
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def _reject(self, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_TOO_LARGE)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": _TOO_LARGE})
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        # A declared length over the cap is refused without reading anything
+        for k, v in scope["headers"]:
+            if k == b"content-length" and v.isdigit() and int(v) > limit:
+                await self._reject(send)
+                return
+
+        chunks, size, more = [], 0, True
+        while more:
+            message = await receive()
+            if message["type"] != "http.request":
+                # client went away; let the app see the disconnect
+                chunks = None
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                await self._reject(send)
+                return
+            chunks.append(chunk)
+            more = message.get("more_body", False)
+
+        if chunks is None:
+            replay = [message]
+        else:
+            replay = [{"type": "http.request", "body": b"".join(chunks), "more_body": False}]
+
+        async def buffered_receive():
+            return replay.pop() if replay else await receive()
+
+        await self.app(scope, buffered_receive, send)
+
+# Added before CORS => 413s still get CORS headers
+app.add_middleware(BodyLimitMiddleware, limits=_BODY_LIMITS)
+
 # -------------------- CORS --------------------
 app.add_middleware(
     CORSMiddleware,
@@ -101,13 +240,162 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------------------- Probes --------------------
+# Load balancers / uptime checks poll these constantly. Answer them here,
+# outside CORS and routing; browser calls (with an Origin header) still go
+# through the normal stack so they get CORS headers.
+_PROBES = {
+    "/": orjson.dumps({"ok": True, "service": "caio-bos"}),
+    "/health": orjson.dumps({"ok": True}),
+    "/welcome": orjson.dumps({"ok": True, "message": "Welcome to CAIO BOS"}),
+}
+
+class ProbeMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            body = _PROBES.get(scope["path"])
+            if body is not None and not any(k == b"origin" for k, _ in scope["headers"]):
+                await send({
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body if scope["method"] == "GET" else b""})
+                return
+        await self.app(scope, receive, send)
+
+# Added last => outermost
+app.add_middleware(ProbeMiddleware)
+
+# -------------------- CPU budget / extraction pool --------------------
+# Extraction is CPU-bound (pypdf/pdfplumber/openpyxl loops hold the GIL), and
+# distinct files are independent, so they run in worker processes. The
+# workers, and the OCR threads / pdfplumber page processes each of them may
+# start (one stage at a time), are sized from one CPU budget, so the pools
+# together keep about EXTRACT_CPU_BUDGET cores busy. Without fork (Windows)
+# extraction runs on the default thread pool.
+CPU_BUDGET = int(os.getenv("EXTRACT_CPU_BUDGET", str(os.cpu_count() or 2)))
+_FORK_OK = "fork" in multiprocessing.get_all_start_methods()
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(max(1, CPU_BUDGET // 2)))) if _FORK_OK else 0
+_CPU_PER_EXTRACT = max(1, CPU_BUDGET // max(1, EXTRACT_WORKERS))
+
+_EXTRACT_POOL: Optional[ProcessPoolExecutor] = None
+_EXTRACT_POOL_LOCK = threading.Lock()
+
+def _extract_worker_ready() -> bool:
+    return True
+
+def _new_extract_pool(method: str) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=EXTRACT_WORKERS,
+        mp_context=multiprocessing.get_context(method),
+    )
+
+# Registered before every other startup hook: the workers are forked
+# (parsers already imported, pages shared copy-on-write) while the server is
+# still single-threaded, before warm-up and pool threads exist.
+@app.on_event("startup")
+async def _startup_extract_pool():
+    global _EXTRACT_POOL
+    if EXTRACT_WORKERS > 0:
+        _EXTRACT_POOL = _new_extract_pool("fork")
+        # fork-context pools start every worker on the first submit
+        await asyncio.wrap_future(_EXTRACT_POOL.submit(_extract_worker_ready))
+
+@app.on_event("shutdown")
+def _shutdown_extract_pool():
+    if _EXTRACT_POOL is not None:
+        _EXTRACT_POOL.shutdown(wait=False, cancel_futures=True)
+
+def _replace_extract_pool(broken: ProcessPoolExecutor) -> None:
+    """
+    Swap out a pool that a crashed worker left broken. The server is
+    threaded by now, so the replacement spawns its workers instead of forking.
+    """
+    global _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        if _EXTRACT_POOL is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            _EXTRACT_POOL = _new_extract_pool("spawn")
+
+# -------------------- SLM (in-process) --------------------
+ROOT = Path(__file__).resolve().parent
+SLM_CONFIG_PATH = os.getenv("SLM_CONFIG", str(ROOT / "slm" / "config" / "models.yaml"))
+SLM_CFG = load_config(SLM_CONFIG_PATH)
+
+# Blocking SLM runs execute here, off the event loop; EA_CONCURRENCY caps
+# how many run at once instead of FastAPI's shared threadpool.
+SLM_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EA_CONCURRENCY", "4")),
+    thread_name_prefix="slm",
+)
+
+# Optional isolation (SLM_ISOLATION=process): SLM runs go to long-lived
+# worker processes that import slm.run_slm and load models.yaml once, so a
+# crashing/leaking brain cannot take the API process down with it.
+SLM_PROC_POOL = None
+if os.getenv("SLM_ISOLATION", "").lower() == "process":
+    SLM_PROC_POOL = ProcessPoolExecutor(
+        max_workers=int(os.getenv("EA_CONCURRENCY", "4")),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=slm_worker_init,
+        initargs=(SLM_CONFIG_PATH,),
+    )
+
+@app.on_event("shutdown")
+def _shutdown_slm_pool():
+    SLM_POOL.shutdown(wait=True)
+    if SLM_PROC_POOL is not None:
+        SLM_PROC_POOL.shutdown(wait=True)
+    OCR_POOL.shutdown(wait=False)
+    if _PAGE_POOL is not None and _PAGE_POOL_PID == os.getpid():
+        _PAGE_POOL.shutdown(wait=False, cancel_futures=True)
+    orchestrate.shutdown()
+    close_session()
+
+@app.on_event("startup")
+async def _startup_rate_limiter():
+    await init_rate_limiter()
+
+@app.on_event("startup")
+async def _startup_slm_warmup():
+    """
+    Start every SLM worker process now (spawn + models.yaml load) instead of
+    on the first requests, and have Ollama load the configured models in the
+    background so the first EA run does not pay the weight load.
+    """
+    loop = asyncio.get_running_loop()
+    if SLM_PROC_POOL is not None:
+        workers = int(os.getenv("EA_CONCURRENCY", "4"))
+        await asyncio.gather(*(
+            asyncio.wrap_future(SLM_PROC_POOL.submit(slm_worker_ready)) for _ in range(workers)
+        ))
+
+    if os.getenv("SLM_WARMUP", "1") != "0":
+        effs = orchestrate.effective_settings(SLM_CFG)
+        targets = {(e["host"], e["model"]) for e in effs.values()}
+        targets.add((effs["ea"]["host"], PRIMARY_EA_MODEL))
+        for host, model in targets:
+            # fire-and-forget; Ollama being down must not block startup
+            loop.run_in_executor(SLM_POOL, warm_model, host, model)
+
+@app.on_event("shutdown")
+async def _shutdown_rate_limiter():
+    await close_rate_limiter()
+
 # -------------------- Helpers --------------------
 def repo_root() -> str:
     # Expect to run from /opt/caio-bos-validator
-    return str(Path(__file__).resolve().parent)
+    return str(ROOT)
 
 def run_slm(
-    input_json_path: str,
+    packet: Dict[str, Any],
     brain: str,
     *,
     model: Optional[str],
@@ -115,308 +403,937 @@ def run_slm(
     num_predict: int,
 ) -> Dict[str, Any]:
     """
-    Thin wrapper around `python -m slm.run_slm ...` so:
-    - Works in dev and on Render
+    Thin wrapper around `slm.run_slm.run(...)` so:
+    - Runs in-process (no interpreter spawn / config reload per request),
+      or on the SLM_PROC_POOL workers when SLM_ISOLATION=process
     - Always returns a dict (either result or structured error)
     """
-    root = repo_root()
-    cmd = [
-        sys.executable,
-        "-m",
-        "slm.run_slm",
-        "--input",
-        input_json_path,
-        "--brain",
-        brain,
-        "--timeout",
-        str(timeout_sec),
-        "--num_predict",
-        str(num_predict),
-    ]
-    if model:
-        cmd += ["--model", model]
-
     try:
-        p = subprocess.run(
-            cmd,
-            cwd=root,
-            capture_output=True,
-            text=True,
-            timeout=timeout_sec + 60,
-        )
-        out = {
-            "stdout": p.stdout or "",
-            "stderr": p.stderr or "",
-            "returncode": p.returncode,
-        }
-        if p.returncode != 0:
-            out["error"] = "SLM failed"
-        # If run_slm prints JSON on stdout, prefer parsing it
-        try:
-            j = json.loads(p.stdout)
-            if isinstance(j, dict):
-                return j
-        except Exception:
-            pass
-        return out
+        if SLM_PROC_POOL is not None:
+            # brains + EA (+ repair pass) each get timeout_sec
+            out = SLM_PROC_POOL.submit(
+                slm_worker_run,
+                packet,
+                brain,
+                model=model,
+                timeout_sec=timeout_sec,
+                num_predict=num_predict,
+            ).result(timeout=(timeout_sec or 300) * 3)
+        else:
+            out = slm_run(
+                packet,
+                brain,
+                cfg=SLM_CFG,
+                model=model,
+                timeout_sec=timeout_sec,
+                num_predict=num_predict,
+            )
+        if isinstance(out, dict):
+            return out
+        return {"error": "SLM failed", "stdout": str(out), "stderr": "non-dict SLM output"}
     except Exception as e:
         return {
             "error": "SLM failed",
             "stdout": "",
-            "stderr": str(e),
+            "stderr": f"{type(e).__name__}: {e}",
         }
 
-def _extract_text_from_upload(filename: str, data: bytes) -> str:
-    """
-    Extract usable text from common file types with fallbacks.
-    - PDFs: pypdf -> pdfplumber -> OCR (optional) if still too short
-    - DOCX: paragraphs + tables
-    - XLSX: all sheets, row-wise
-    - CSV/TSV: delimiter sniff + robust decoding
-    - Images: OCR (optional)
-    Always returns a string; never raises UnicodeDecodeError.
-    """
-    name = (filename or "").lower().strip()
+async def run_slm_async(
+    packet: Dict[str, Any],
+    brain: str,
+    *,
+    model: Optional[str],
+    timeout_sec: int,
+    num_predict: int,
+) -> Dict[str, Any]:
+    """Await `run_slm` on SLM_POOL so the event loop stays free during the LLM call."""
+    # Same overall budget on every path as the process pool (brains + EA + repair)
+    deadline = (timeout_sec or 300) * 3
+    if brain == "ea" and SLM_PROC_POOL is None:
+        # Brains fan out on the shared brain pool (slm.orchestrate); same contract as run_slm
+        try:
+            bundle = await asyncio.wait_for(
+                orchestrate.run_ea_inproc(
+                    packet, cfg=SLM_CFG, model=model, timeout_sec=timeout_sec, num_predict=num_predict,
+                ),
+                timeout=deadline,
+            )
+        except asyncio.TimeoutError:
+            return {"error": "SLM failed", "stdout": "", "stderr": f"TimeoutError: no result within {deadline}s"}
+        except Exception as e:
+            return {"error": "SLM failed", "stdout": "", "stderr": f"{type(e).__name__}: {e}"}
+        return bundle["ui"]
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(
+                SLM_POOL,
+                partial(run_slm, packet, brain, model=model, timeout_sec=timeout_sec, num_predict=num_predict),
+            ),
+            timeout=deadline,
+        )
+    except asyncio.TimeoutError:
+        return {"error": "SLM failed", "stdout": "", "stderr": f"TimeoutError: no result within {deadline}s"}
 
-    # --- Safety caps ---
-    MAX_TEXT_CHARS = 250_000      # hard cap to keep packets sane
-    PDF_MIN_TEXT_CHARS = 3000     # below this, try fallback (plumber/OCR)
-    MAX_PDF_PAGES_OCR = 12        # OCR can be expensive; cap pages
-    MAX_XLSX_ROWS_PER_SHEET = 2000
-    MAX_XLSX_CELLS_PER_ROW = 50
+def _slm_failed(out: Any) -> bool:
+    ui_obj = out.get("ui") if isinstance(out, dict) else None
+    return bool(
+        (isinstance(out, dict) and out.get("error"))
+        or (isinstance(ui_obj, dict) and ui_obj.get("error"))
+    )
 
-    def _cap(s: str) -> str:
-        s = (s or "").strip()
-        return s[:MAX_TEXT_CHARS]
+async def _reserve_credits(user_id: int, brain: str) -> Optional[Tuple[int, datetime.date]]:
+    """
+    Debit the run up front; returns the (credits, usage date) reservation to
+    refund if it fails, or None when nothing was debited.
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(reserve_bos_run, user_id=user_id, brain=brain)
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        # If the credit system itself fails, still allow run; you can tighten later
+        return None
+
+def _refund_credits(user_id: int, brain: str, reserved: Optional[Tuple[int, datetime.date]]) -> None:
+    # fire-and-forget on the default pool, so it also runs for cancelled requests
+    if reserved:
+        credits, usage_date = reserved
+        asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(refund_bos_run, user_id=user_id, brain=brain, credits=credits, usage_date=usage_date),
+        )
 
-    def _decode_bytes(b: bytes) -> str:
-        # Try common encodings. utf-8-sig handles BOM.
-        for enc in ("utf-8-sig", "utf-8", "cp1252", "latin-1"):
-            try:
-                return b.decode(enc)
-            except Exception:
-                continue
-        return b.decode("utf-8", errors="ignore")
+# Currency / pricing cues, fused into one alternation so a text is scanned once
+_MONEY_RE = re.compile(
+    "|".join([
+        r"₹", r"\$", r"\binr\b", r"\busd\b", r"\brs\.?\b", r"\bgst\b", r"\btax\b",
+        r"\btotal\b", r"\bsubtotal\b", r"\bgrand total\b", r"\bamount\b",
+        r"\bquotation\b", r"\binvoice\b", r"\bpricing\b",
+        r"\b\d{1,3}(?:,\d{3})+(?:\.\d+)?\b",  # 1,23,456 style
+        r"\b\d+\.\d+\b",
+    ]),
+    re.IGNORECASE,
+)
+_QUOTE_FILENAME_RE = re.compile(r"quote|quotation|invoice|pricing|estimate|proposal", re.IGNORECASE)
+
+# An upload is either its bytes or the path of a spooled copy on disk. Every
+# parser below takes a path or a file-like, so spooled uploads are parsed
+# straight from disk without being read into memory first.
+UploadSource = Union[bytes, str]
+
+def _src_file(src: UploadSource):
+    return io.BytesIO(src) if isinstance(src, (bytes, bytearray)) else src
+
+def _src_bytes(src: UploadSource) -> bytes:
+    if isinstance(src, (bytes, bytearray)):
+        return src
+    with open(src, "rb") as f:
+        return f.read()
+
+def _open_pdf_fitz(b: UploadSource):
+    """PyMuPDF document for `b`, or None if fitz is missing or cannot open it."""
+    if fitz is None:
+        return None
+    try:
+        if isinstance(b, (bytes, bytearray)):
+            return fitz.open(stream=b, filetype="pdf")
+        return fitz.open(b, filetype="pdf")
+    except Exception:
+        return None
 
-    def _is_probably_binary(b: bytes) -> bool:
-        # Heuristic: lots of NUL bytes suggests binary
-        return b.count(b"\x00") > 10
+def _extract_pdf_pymupdf(doc) -> Tuple[str, Optional[List[int]]]:
+    """(text, chars per page) from an open document; the list is None on failure."""
+    if doc is None:
+        return "", None
+    try:
+        texts = [page.get_text("text").strip() for page in doc]
+        return "\n\n".join(t for t in texts if t).strip(), [len(t) for t in texts]
+    except Exception:
+        return "", None
 
-    def _extract_pdf_pypdf(b: bytes) -> str:
-        if PdfReader is None:
-            return ""
+def _xlsx_parts_calamine(data: UploadSource, max_rows: int, max_cells: int) -> List[str]:
+    """Same "[Sheet: x]" / "a | b | c" lines as the openpyxl loop, read via calamine."""
+    if isinstance(data, (bytes, bytearray)):
+        wb = CalamineWorkbook.from_filelike(io.BytesIO(data))
+    else:
+        wb = CalamineWorkbook.from_path(data)
+    parts = []
+    for sheet_name in wb.sheet_names:
+        parts.append(f"[Sheet: {sheet_name}]")
+        # iter_rows() converts one row at a time, so the cap bounds the work
+        rows = wb.get_sheet_by_name(sheet_name).iter_rows()
+        for row_count, row in enumerate(rows):
+            if row_count >= max_rows:
+                parts.append("[TRUNCATED: too many rows]")
+                break
+            cells = []
+            for c in row[:max_cells]:
+                if c is None or c == "":
+                    continue
+                # calamine yields floats for integral numbers; print them like openpyxl
+                if isinstance(c, float) and c.is_integer():
+                    c = int(c)
+                s = str(c).strip()
+                if s:
+                    cells.append(s)
+            if cells:
+                parts.append(" | ".join(cells))
+    return parts
+
+def _decode_text(b: bytes) -> str:
+    # A BOM settles the encoding outright. Otherwise strict UTF-8 settles
+    # almost every upload in one pass; only undecodable bytes get detection,
+    # run on a 64 KB sample, followed by a single decode of the whole buffer.
+    if b.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return b.decode("utf-16", errors="replace")
+    try:
+        return b.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        pass
+    if detect_charset is not None:
         try:
-            reader = PdfReader(io.BytesIO(b))
-            parts = []
-            for page in reader.pages:
-                t = page.extract_text() or ""
-                t = t.strip()
-                if t:
-                    parts.append(t)
-            return "\n\n".join(parts).strip()
+            best = detect_charset(b[:65536]).best()
+            if best is not None:
+                return b.decode(best.encoding, errors="replace")
         except Exception:
-            return ""
+            pass
+    return b.decode("cp1252", errors="replace")
+
+# Tesseract runs as a subprocess per page, so a thread pool OCRs pages in
+# parallel. Each tesseract is pinned to one OpenMP thread to avoid
+# oversubscribing cores.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", str(_CPU_PER_EXTRACT)))
+OCR_POOL = ThreadPoolExecutor(
+    max_workers=OCR_CONCURRENCY,
+    thread_name_prefix="ocr",
+)
+
+# tesserocr keeps one engine per OCR thread, so the language model is loaded
+# once per thread instead of once per page; it releases the GIL while
+# recognising, so OCR_POOL threads still run in parallel.
+_TESS_LOCAL = threading.local()
+
+def _tess_api():
+    api = getattr(_TESS_LOCAL, "api", None)
+    if api is None:
+        api = _TESS_LOCAL.api = tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+    return api
+
+def _ocr_image_bytes(img_bytes: UploadSource) -> str:
+    if pytesseract is None or Image is None:
+        return ""
+    try:
+        # tesseract binarizes a single grey channel anyway; skip the RGB work
+        img = Image.open(_src_file(img_bytes)).convert("L")
+        if tesserocr is not None:
+            try:
+                api = _tess_api()
+                api.SetImage(img)
+                return (api.GetUTF8Text() or "").strip()
+            except Exception:
+                pass  # fall back to the CLI
+        txt = pytesseract.image_to_string(img)
+        return (txt or "").strip()
+    except Exception:
+        return ""
 
-    def _extract_pdf_pdfplumber(b: bytes) -> str:
-        if pdfplumber is None:
-            return ""
+def _ocr_image_file(path: str) -> str:
+    # pytesseract hands a path straight to tesseract: no read/copy in Python.
+    # The page is deleted as soon as it is OCR'd to keep tmpfs small.
+    if pytesseract is None:
+        return ""
+    try:
+        return (pytesseract.image_to_string(path) or "").strip()
+    except Exception:
+        return ""
+    finally:
         try:
-            parts = []
-            with pdfplumber.open(io.BytesIO(b)) as pdf:
-                for page in pdf.pages:
-                    t = page.extract_text() or ""
-                    t = t.strip()
-                    if t:
-                        parts.append(t)
-            return "\n\n".join(parts).strip()
-        except Exception:
-            return ""
+            os.remove(path)
+        except OSError:
+            pass
 
-    def _extract_image_ocr(img_bytes: bytes) -> str:
-        if pytesseract is None or Image is None:
-            return ""
+# Calling the tesseract CLI with a list file OCRs many pages in one process,
+# so engine start-up (~20% of a page's time) is paid once per batch. Pages
+# come back in list order, each terminated by a form feed.
+_TESSERACT = shutil.which("tesseract")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_BATCH_TIMEOUT = int(os.getenv("OCR_BATCH_TIMEOUT", "180"))
+
+def _ocr_file_batch(paths: List[str]) -> List[str]:
+    """OCR a batch of page images with one tesseract engine; per-page fallback."""
+    texts = None
+    if tesserocr is not None:
         try:
-            img = Image.open(io.BytesIO(img_bytes))
-            # Basic OCR; keep it simple/reliable
-            txt = pytesseract.image_to_string(img)
-            return (txt or "").strip()
+            api = _tess_api()
+            texts = []
+            for p in paths:
+                api.SetImageFile(p)
+                texts.append((api.GetUTF8Text() or "").strip())
         except Exception:
-            return ""
-
-    def _extract_pdf_ocr(b: bytes) -> str:
-        """
-        OCR PDF by rendering pages to images via pdftoppm (poppler-utils)
-        and running pytesseract. Uses a cap on pages.
-        """
-        if pytesseract is None or Image is None:
-            return ""
-        # If poppler isn't installed, this will fail; we catch below.
-        import tempfile
-        import subprocess
-        import os
+            texts = None
+    if texts is None and _TESSERACT and len(paths) > 1:
         try:
             with tempfile.TemporaryDirectory() as td:
-                pdf_path = os.path.join(td, "in.pdf")
-                with open(pdf_path, "wb") as f:
-                    f.write(b)
-
-                # Render to PNGs: page-1.png, page-2.png, ...
-                # -f 1 -l N caps pages
-                out_prefix = os.path.join(td, "page")
-                cmd = ["pdftoppm", "-png", "-f", "1", "-l", str(MAX_PDF_PAGES_OCR), pdf_path, out_prefix]
-                subprocess.run(cmd, check=True, capture_output=True)
-
-                parts = []
-                # Collect rendered pages in order
-                for i in range(1, MAX_PDF_PAGES_OCR + 1):
-                    img_path = f"{out_prefix}-{i}.png"
-                    if not os.path.exists(img_path):
-                        break
-                    with open(img_path, "rb") as imf:
-                        img_bytes = imf.read()
-                    t = _extract_image_ocr(img_bytes)
-                    if t:
-                        parts.append(f"[OCR Page {i}]\n{t}")
-                return "\n\n".join(parts).strip()
+                list_path = os.path.join(td, "pages.txt")
+                with open(list_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(paths) + "\n")
+                out_base = os.path.join(td, "out")
+                subprocess.run(
+                    [_TESSERACT, list_path, out_base, "-l", OCR_LANG, "txt"],
+                    check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    timeout=OCR_BATCH_TIMEOUT,
+                )
+                with open(out_base + ".txt", encoding="utf-8", errors="ignore") as f:
+                    chunks = f.read().split("\f")
+            # a trailing form feed leaves one empty chunk at the end
+            if len(chunks) >= len(paths):
+                texts = [c.strip() for c in chunks[:len(paths)]]
         except Exception:
-            return ""
+            texts = None
 
-    # -------------------------
-    # PDF
-    # -------------------------
-    if name.endswith(".pdf"):
-        # 1) pypdf
-        t1 = _extract_pdf_pypdf(data)
-        best = t1
+    if texts is None:
+        # list mode unavailable, hung or out of step: one call per page
+        return [_ocr_image_file(p) for p in paths]
 
-        # 2) pdfplumber fallback
-        if len(best) < PDF_MIN_TEXT_CHARS:
-            t2 = _extract_pdf_pdfplumber(data)
-            if len(t2) > len(best):
-                best = t2
+    for p in paths:
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+    return texts
+
+def _ocr_many_files(paths: List[str]) -> List[str]:
+    """OCR several page images concurrently; results keep input order."""
+    if not paths:
+        return []
+    # One tesseract batch per OCR worker: start-up is amortised across the
+    # batch while the batches still run in parallel.
+    n = max(1, min(OCR_CONCURRENCY, len(paths)))
+    size = -(-len(paths) // n)
+    batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+    out: List[str] = []
+    for texts in OCR_POOL.map(_ocr_file_batch, batches):
+        out.extend(texts)
+    return out
 
-        # 3) OCR fallback (optional)
-        if len(best) < PDF_MIN_TEXT_CHARS:
-            t3 = _extract_pdf_ocr(data)
-            if len(t3) > len(best):
-                best = t3
+# -------------------- Extraction --------------------
+# One extractor for every upload path. Tuning knobs and per-format helpers
+# live at module level so nothing is rebuilt per call.
+MAX_TEXT_CHARS = 250_000       # hard cap to keep packets sane
+PDF_MIN_TEXT_CHARS = 3000      # below this, consider fallbacks (plumber/OCR)
+PDF_COMPLETE_CHARS = 500       # short-but-complete threshold for skipping fallbacks
+PDF_TINY_CHARS = 300           # below this, always try pdfplumber
+PDF_PAGE_TEXT_CHARS = 40       # a page yielding more than this has a text layer
+PDF_TEXT_PAGE_RATIO = 0.5      # above this share of text pages, skip plumber/OCR
+
+OCR_DPI = 200                  # LSTM accuracy on printed text barely moves above ~200 DPI
+OCR_HEAD_PAGES = 4
+OCR_TAIL_PAGES = 4
+OCR_MAX_TOTAL_PAGES = 12       # safety
+
+MAX_XLSX_ROWS_PER_SHEET = 2000
+MAX_XLSX_CELLS_PER_ROW = 50
+MAX_CSV_ROWS = 3000
+MAX_CSV_COLS = 60
+
+def _cap(s: str) -> str:
+    s = (s or "").strip()
+    return s[:MAX_TEXT_CHARS]
+
+BINARY_SNIFF_BYTES = 8 * 1024
+# Bytes plain text is made of: BEL/BS/TAB/LF/FF/CR/ESC, printable ASCII and
+# 0x80+ (UTF-8 / legacy code pages). Whatever survives deleting them is junk.
+_TEXT_BYTES = bytes([7, 8, 9, 10, 12, 13, 27]) + bytes(range(0x20, 0x7F)) + bytes(range(0x80, 0x100))
+
+def _is_probably_binary(b: UploadSource) -> bool:
+    # Binary formats show it in the first block: any NUL there (UTF-16 text
+    # aside, which _decode_text handles), or mostly control bytes.
+    if isinstance(b, (bytes, bytearray)):
+        head = bytes(b[:BINARY_SNIFF_BYTES])
+    else:
+        with open(b, "rb") as f:
+            head = f.read(BINARY_SNIFF_BYTES)
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return False
+    if b"\x00" in head:
+        return True
+    return len(head.translate(None, _TEXT_BYTES)) * 10 > len(head)
+
+def _money_signals(s: str) -> bool:
+    return bool(s) and _MONEY_RE.search(s) is not None
+
+def _quote_like_filename(n: str) -> bool:
+    return _QUOTE_FILENAME_RE.search(n) is not None
+
+def _extract_pdf_pypdf(b: UploadSource) -> Tuple[str, Optional[List[int]]]:
+    """(text, chars per page); the list is None when the PDF could not be opened."""
+    if PdfReader is None:
+        return "", None
+    try:
+        reader = PdfReader(_src_file(b))
+        texts = [(page.extract_text() or "").strip() for page in reader.pages]
+        return "\n\n".join(t for t in texts if t).strip(), [len(t) for t in texts]
+    except Exception:
+        return "", None
+
+# pdfplumber (pdfminer) is pure Python and by far the slowest PDF step, so
+# long documents are split into page ranges parsed in parallel processes.
+PDF_PARALLEL_MIN_PAGES = 8
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", str(min(4, _CPU_PER_EXTRACT))))
+_PAGE_POOL: Optional[ProcessPoolExecutor] = None
+_PAGE_POOL_PID: Optional[int] = None
+_PAGE_POOL_LOCK = threading.Lock()
+
+def _page_pool() -> Optional[ProcessPoolExecutor]:
+    global _PAGE_POOL, _PAGE_POOL_PID
+    if PDF_PAGE_WORKERS < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    with _PAGE_POOL_LOCK:
+        # Created lazily in the process that parses (usually an extraction
+        # worker); a pool inherited across fork is not usable.
+        if _PAGE_POOL is None or _PAGE_POOL_PID != os.getpid():
+            _PAGE_POOL = ProcessPoolExecutor(
+                max_workers=PDF_PAGE_WORKERS,
+                mp_context=multiprocessing.get_context("fork"),
+            )
+            _PAGE_POOL_PID = os.getpid()
+        return _PAGE_POOL
+
+def _pdfplumber_pages(b: UploadSource, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Text of pages [start, end) (0-based; end=None for all), empty pages dropped."""
+    parts = []
+    pages = None if end is None else list(range(start + 1, end + 1))
+    with pdfplumber.open(_src_file(b), pages=pages) as pdf:
+        for page in pdf.pages:
+            t = (page.extract_text() or "").strip()
+            if t:
+                parts.append(t)
+    return parts
+
+def _extract_pdf_pdfplumber(b: UploadSource, page_count: Optional[int] = None) -> str:
+    if pdfplumber is None:
+        return ""
+    try:
+        pool = _page_pool() if page_count and page_count >= PDF_PARALLEL_MIN_PAGES else None
+        if pool is not None:
+            step = -(-page_count // PDF_PAGE_WORKERS)
+            futs = [
+                pool.submit(_pdfplumber_pages, b, i, min(i + step, page_count))
+                for i in range(0, page_count, step)
+            ]
+            parts = [t for f in futs for t in f.result()]
+        else:
+            parts = _pdfplumber_pages(b)
+        return "\n\n".join(parts).strip()
+    except Exception:
+        return ""
 
-        return _cap(best)
+def _extract_pdf_ocr_first_last(
+    b: UploadSource,
+    page_count: Optional[int],
+    skip_pages: frozenset = frozenset(),
+    doc=None,
+) -> str:
+    """
+    OCR first N pages and last N pages, minus `skip_pages` (1-based pages
+    whose text layer already yielded text).
+    Pages are rasterized from `doc` (the PyMuPDF document the text pass
+    already opened) when given, else with pdftoppm; then PNG -> tesseract.
+    """
+    if pytesseract is None or Image is None:
+        return ""
+    try:
+        with tempfile.TemporaryDirectory() as td:
+            # The text pass normally supplies the page count; only re-parse
+            # if none of them could open the PDF.
+            if page_count is None:
+                try:
+                    if PdfReader is not None:
+                        page_count = len(PdfReader(_src_file(b)).pages)
+                except Exception:
+                    page_count = None
 
-    # -------------------------
-    # DOCX
-    # -------------------------
-    if name.endswith(".docx"):
-        if docx is None:
-            return ""
-        try:
-            d = docx.Document(io.BytesIO(data))
-            parts = []
-
-            # paragraphs
-            for p in d.paragraphs:
-                txt = (p.text or "").strip()
-                if txt:
-                    parts.append(txt)
-
-            # tables
-            for table in d.tables:
-                for row in table.rows:
-                    cells = []
-                    for cell in row.cells:
-                        ct = (cell.text or "").strip()
-                        if ct:
-                            cells.append(ct)
-                    if cells:
-                        parts.append(" | ".join(cells))
-
-            return _cap("\n".join(parts))
-        except Exception:
-            return ""
+            head_n = OCR_HEAD_PAGES
+            tail_n = OCR_TAIL_PAGES
+
+            if page_count is not None:
+                # cap total OCR pages
+                if head_n + tail_n > OCR_MAX_TOTAL_PAGES:
+                    head_n = min(head_n, OCR_MAX_TOTAL_PAGES)
+                    tail_n = max(0, OCR_MAX_TOTAL_PAGES - head_n)
+                tail_start = max(1, page_count - tail_n + 1)
+            else:
+                # unknown count: just OCR first OCR_MAX_TOTAL_PAGES pages
+                head_n = min(head_n + tail_n, OCR_MAX_TOTAL_PAGES)
+                tail_n = 0
+                tail_start = None
+
+            # Pages to OCR; overlapping head/tail never renders a page twice
+            wanted = set(range(1, (head_n if page_count is None else min(head_n, page_count)) + 1))
+            if tail_n > 0 and tail_start is not None:
+                wanted.update(range(tail_start, page_count + 1))
+            wanted = sorted(wanted - skip_pages)
+
+            # (page number, png path); tesseract reads the files directly
+            if doc is not None:
+                # Same parsed document as the text pass: no second xref parse,
+                # no PDF copy on disk, no pdftoppm process
+                pages = []
+                for n in wanted:
+                    pix = doc[n - 1].get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+                    img_path = os.path.join(td, f"page-{n}.png")
+                    pix.save(img_path)
+                    pages.append((n, img_path))
+            else:
+                pages = _render_pages_pdftoppm(b, wanted, td)
+
+            texts = _ocr_many_files([img_path for _, img_path in pages])
+            parts = [
+                f"[OCR {'Head' if n <= head_n else 'Tail'} Page {n}]\n{t}"
+                for (n, _), t in zip(pages, texts)
+                if t
+            ]
+            return "\n\n".join(parts).strip()
 
-    # -------------------------
-    # Excel
-    # -------------------------
-    if name.endswith(".xlsx"):
-        if openpyxl is None:
-            return ""
-        try:
-            wb = openpyxl.load_workbook(io.BytesIO(data), data_only=True)
-            parts = []
-            for sheet in wb.worksheets:
-                parts.append(f"[Sheet: {sheet.title}]")
-                row_count = 0
-                for row in sheet.iter_rows(values_only=True):
-                    if row_count >= MAX_XLSX_ROWS_PER_SHEET:
-                        parts.append("[TRUNCATED: too many rows]")
-                        break
-                    row_count += 1
+    except Exception:
+        return ""
 
+def _render_pages_pdftoppm(b: UploadSource, wanted: List[int], td: str) -> List[Tuple[int, str]]:
+    """Rasterize `wanted` pages with pdftoppm, one process per contiguous run."""
+    if isinstance(b, (bytes, bytearray)):
+        pdf_path = os.path.join(td, "in.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b)
+    else:
+        pdf_path = b  # already spooled; pdftoppm reads it in place
+
+    ranges = []
+    for n in wanted:
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+
+    # Runs render concurrently: start every pdftoppm, then wait
+    procs = []
+    for i, (first, last) in enumerate(ranges):
+        out_prefix = os.path.join(td, f"run{i}")
+        cmd = ["pdftoppm", "-r", str(OCR_DPI), "-gray", "-png", "-f", str(first), "-l", str(last), pdf_path, out_prefix]
+        procs.append((out_prefix, subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)))
+
+    pages = []
+    for out_prefix, proc in procs:
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+        # Output is named by real page number, zero-padded to the
+        # document's digit count (run0-07.png, run1-118.png, ...)
+        for img_path in glob.glob(f"{out_prefix}-*.png"):
+            pages.append((int(img_path[len(out_prefix) + 1:-4]), img_path))
+    pages.sort()
+    return pages
+
+def _docx_parts(data: UploadSource) -> List[str]:
+    """Paragraphs, then one "a | b | c" line per table row."""
+    d = docx.Document(_src_file(data))
+    parts = []
+
+    for p in d.paragraphs:
+        txt = (p.text or "").strip()
+        if txt:
+            parts.append(txt)
+
+    for table in d.tables:
+        for row in table.rows:
+            cells = []
+            for cell in row.cells:
+                ct = (cell.text or "").strip()
+                if ct:
+                    cells.append(ct)
+            if cells:
+                parts.append(" | ".join(cells))
+    return parts
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _docx_parts_xml(data: UploadSource) -> List[str]:
+    """
+    Same output as _docx_parts() (body paragraphs, then one line per table
+    row), streamed from word/document.xml without building python-docx's
+    object graph.
+    """
+    paras: List[str] = []
+    rows: List[str] = []
+    buf: List[str] = []
+    cells: Optional[List[str]] = None
+    cell_paras: Optional[List[str]] = None
+    tbl_depth = 0
+    with zipfile.ZipFile(_src_file(data)) as z, z.open("word/document.xml") as f:
+        for ev, el in _xml_etree.iterparse(f, events=("start", "end")):
+            tag = el.tag
+            if ev == "start":
+                if tag == _W + "tbl":
+                    tbl_depth += 1
+                elif tbl_depth == 1 and tag == _W + "tr":
                     cells = []
-                    for c in row[:MAX_XLSX_CELLS_PER_ROW]:
-                        if c is None:
-                            continue
-                        s = str(c).strip()
-                        if s:
-                            cells.append(s)
-                    if cells:
-                        parts.append(" | ".join(cells))
-            return _cap("\n".join(parts))
+                elif tbl_depth == 1 and tag == _W + "tc":
+                    cell_paras = []
+                continue
+
+            if tag == _W + "t":
+                buf.append(el.text or "")
+            elif tag == _W + "tab":
+                buf.append("\t")
+            elif tag in (_W + "br", _W + "cr"):
+                buf.append("\n")
+            elif tag == _W + "p":
+                txt = "".join(buf).strip()
+                buf.clear()
+                if tbl_depth == 0:
+                    if txt:
+                        paras.append(txt)
+                elif tbl_depth == 1 and cell_paras is not None:
+                    cell_paras.append(txt)
+                el.clear()
+            elif tbl_depth == 1 and tag == _W + "tc":
+                ct = "\n".join(cell_paras or ()).strip()
+                if ct and cells is not None:
+                    cells.append(ct)
+                cell_paras = None
+            elif tbl_depth == 1 and tag == _W + "tr":
+                if cells:
+                    rows.append(" | ".join(cells))
+                cells = None
+            elif tag == _W + "tbl":
+                tbl_depth -= 1
+                el.clear()
+    return paras + rows
+
+def _xlsx_parts_openpyxl(data: UploadSource, max_rows: int, max_cells: int) -> List[str]:
+    # read_only streams rows from the sheet XML instead of building the whole
+    # workbook in memory; max_row/max_col stop the parse at our caps.
+    wb = openpyxl.load_workbook(_src_file(data), data_only=True, read_only=True)
+    try:
+        parts = []
+        for sheet in wb.worksheets:
+            parts.append(f"[Sheet: {sheet.title}]")
+            row_count = 0
+            for row in sheet.iter_rows(values_only=True, max_row=max_rows + 1, max_col=max_cells):
+                if row_count >= max_rows:
+                    parts.append("[TRUNCATED: too many rows]")
+                    break
+                row_count += 1
+
+                cells = []
+                for c in row:
+                    if c is None:
+                        continue
+                    s = str(c).strip()
+                    if s:
+                        cells.append(s)
+                if cells:
+                    parts.append(" | ".join(cells))
+        return parts
+    finally:
+        wb.close()  # read-only workbooks keep the zip open until closed
+
+def _csv_lines(text: str, delim: str, max_rows: int, max_cols: int) -> List[str]:
+    # Without quote characters a row is just its line split on the delimiter;
+    # str.split runs in C where csv.reader tokenizes char by char. The bounded
+    # split also stops at the row cap instead of splitting the whole file.
+    if '"' not in text and ("\n" in text or "\r" not in text):
+        lines = text.split("\n", max_rows)
+        truncated = len(lines) > max_rows and lines[max_rows].strip() != ""
+        out_lines = []
+        for line in lines[:max_rows]:
+            row = [c.strip() for c in line.split(delim, max_cols)[:max_cols]]
+            row = [c for c in row if c]
+            if row:
+                out_lines.append(" | ".join(row))
+        if truncated:
+            out_lines.append("[TRUNCATED: too many rows]")
+        return out_lines
+
+    rdr = csv.reader(io.StringIO(text), delimiter=delim)
+    out_lines = []
+    for i, row in enumerate(rdr):
+        if i >= max_rows:
+            out_lines.append("[TRUNCATED: too many rows]")
+            break
+        row = [(c or "").strip() for c in row[:max_cols]]
+        row = [c for c in row if c]
+        if row:
+            out_lines.append(" | ".join(row))
+    return out_lines
+
+# Leading bytes of the formats we parse. Content decides the branch when the
+# filename is missing or lies (e.g. "scan" or "report.bin" that is a PDF).
+_MAGIC = (
+    (b"%PDF", ".pdf"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\xd0\xcf\x11\xe0", ".ole"),   # legacy .doc/.xls: not parsed
+    (b"PK\x03\x04", ".zip"),          # OOXML container; refined below
+)
+_SNIFF_EXTS = {
+    ".pdf": (".pdf",),
+    ".png": (".png", ".jpg", ".jpeg", ".webp"),
+    ".jpg": (".png", ".jpg", ".jpeg", ".webp"),
+    ".docx": (".docx",),
+    ".xlsx": (".xlsx",),
+}
+
+def _sniff_ext(src: UploadSource) -> Optional[str]:
+    """Extension implied by the file's magic bytes, or None if unrecognised."""
+    if isinstance(src, (bytes, bytearray)):
+        head = bytes(src[:8])
+    else:
+        with open(src, "rb") as f:
+            head = f.read(8)
+    ext = next((e for m, e in _MAGIC if head.startswith(m)), None)
+    if ext == ".zip":
+        # Only the central directory is read to tell DOCX from XLSX
+        try:
+            with zipfile.ZipFile(_src_file(src)) as z:
+                names = set(z.namelist())
         except Exception:
-            return ""
+            return None
+        if "word/document.xml" in names:
+            return ".docx"
+        if "xl/workbook.xml" in names:
+            return ".xlsx"
+        return None
+    return ext
+
+def _extract_text_from_upload(filename: str, data: UploadSource) -> str:
+    """Text-only form of _extract_text_with_meta(); never raises UnicodeDecodeError."""
+    return _extract_text_with_meta(filename, data)[0]
+
+# -------------------------
+# PDF
+# -------------------------
+def _extract_pdf(filename: str, ext: str, data: UploadSource, meta: dict) -> tuple[str, dict]:
+    # One PyMuPDF parse serves the text pass and OCR rasterization
+    doc = _open_pdf_fitz(data)
+    try:
+        meta["methods_tried"].append("pdf:pymupdf")
+        best, page_chars = _extract_pdf_pymupdf(doc)
+        best_method = "pdf:pymupdf"
+
+        # pypdf reads the same text layer far slower; it only earns its keep
+        # when PyMuPDF is missing or could not open the file.
+        if page_chars is None:
+            meta["methods_tried"].append("pdf:pypdf")
+            t1, page_chars = _extract_pdf_pypdf(data)
+            if len(t1) > len(best):
+                best = t1
+                best_method = "pdf:pypdf"
+        else:
+            meta["methods_tried"].append("skipped:pypdf(pymupdf_ok)")
+        page_count = len(page_chars) if page_chars is not None else None
+
+        # Judge by per-page yield, not just the total: when most pages have a
+        # text layer the PDF was read fine and is merely sparse (slides,
+        # drawings), and only the empty pages are worth OCR'ing.
+        text_pages = frozenset(i + 1 for i, c in enumerate(page_chars or ()) if c > PDF_PAGE_TEXT_CHARS)
+        mostly_text = bool(page_chars) and len(text_pages) / len(page_chars) > PDF_TEXT_PAGE_RATIO
+
+        # Short is not the same as incomplete: a one-page quote with prices is
+        # fully extracted well under PDF_MIN_TEXT_CHARS. Only escalate to
+        # pdfplumber / OCR when the text looks like it is actually missing.
+        if len(best) < PDF_MIN_TEXT_CHARS:
+            if mostly_text:
+                meta["methods_tried"] += ["skipped:plumber(text_pages)", "skipped:ocr(text_pages)"]
+            elif len(best) > PDF_COMPLETE_CHARS and _money_signals(best):
+                meta["methods_tried"] += ["skipped:plumber(has_money)", "skipped:ocr(has_money)"]
+            else:
+                if len(best) < PDF_TINY_CHARS or _quote_like_filename(filename):
+                    meta["methods_tried"].append("pdf:pdfplumber")
+                    t2 = _extract_pdf_pdfplumber(data, page_count)
+                    if len(t2) > len(best):
+                        best = t2
+                        best_method = "pdf:pdfplumber"
+                else:
+                    meta["methods_tried"].append("skipped:plumber(not_quote)")
+
+                if len(best) < PDF_COMPLETE_CHARS:
+                    meta["methods_tried"].append("pdf:ocr_first_last")
+                    t3 = _extract_pdf_ocr_first_last(data, page_count, text_pages, doc)
+                    if text_pages and t3:
+                        # OCR covered only the pages without text; keep both
+                        best = f"{best}\n\n{t3}"
+                        best_method = "pdf:text+ocr"
+                    elif len(t3) > len(best):
+                        best = t3
+                        best_method = "pdf:ocr_first_last"
+                else:
+                    meta["methods_tried"].append("skipped:ocr(has_text)")
+    finally:
+        if doc is not None:
+            doc.close()
+
+    best = _cap(best)
+    if page_count is not None:
+        meta["page_count"] = page_count
+    meta["chosen_method"] = best_method
+    meta["text_len"] = len(best)
+
+    # Quality flags + UX hints (Option A + C)
+    if meta["text_len"] < PDF_MIN_TEXT_CHARS:
+        meta["quality_flags"].append("LOW_TEXT_PDF")
+
+    if _quote_like_filename(filename):
+        meta["hints"]["quote_like_filename"] = True
+        if not _money_signals(best):
+            meta["quality_flags"].append("LIKELY_QUOTE_PRICING_NOT_EXTRACTED")
+
+    return best, meta
+
+# -------------------------
+# DOCX (paragraphs + tables)
+# -------------------------
+def _extract_docx(filename: str, ext: str, data: UploadSource, meta: dict) -> tuple[str, dict]:
+    meta["methods_tried"].append("docx:xml")
+    try:
+        out = _cap("\n".join(_docx_parts_xml(data)))
+        meta["chosen_method"] = "docx:xml"
+        meta["text_len"] = len(out)
+        if meta["text_len"] < 200:
+            meta["quality_flags"].append("LOW_TEXT_DOCX")
+        return out, meta
+    except Exception:
+        pass  # fall back to python-docx
 
-    # -------------------------
-    # CSV / TSV
-    # -------------------------
-    if name.endswith((".csv", ".tsv")):
+    meta["methods_tried"].append("docx:python-docx")
+    if docx is None:
+        meta["quality_flags"].append("DOCX_PARSER_MISSING")
+        return "", meta
+    try:
+        out = _cap("\n".join(_docx_parts(data)))
+        meta["chosen_method"] = "docx:python-docx"
+        meta["text_len"] = len(out)
+        if meta["text_len"] < 200:
+            meta["quality_flags"].append("LOW_TEXT_DOCX")
+        return out, meta
+    except Exception:
+        meta["quality_flags"].append("DOCX_EXTRACT_FAILED")
+        return "", meta
+
+# -------------------------
+# XLSX
+# -------------------------
+def _extract_xlsx(filename: str, ext: str, data: UploadSource, meta: dict) -> tuple[str, dict]:
+    if CalamineWorkbook is not None:
+        meta["methods_tried"].append("xlsx:calamine")
         try:
-            text = _decode_bytes(data)
-            # Sniff delimiter (fallback to comma/tsv)
-            sample = text[:4096]
-            try:
-                dialect = csv.Sniffer().sniff(sample, delimiters=[",", "\t", ";", "|"])
-                delim = dialect.delimiter
-            except Exception:
-                delim = "\t" if name.endswith(".tsv") else ","
+            out = _cap("\n".join(_xlsx_parts_calamine(data, MAX_XLSX_ROWS_PER_SHEET, MAX_XLSX_CELLS_PER_ROW)))
+            meta["chosen_method"] = "xlsx:calamine"
+            meta["text_len"] = len(out)
+            if meta["text_len"] < 200:
+                meta["quality_flags"].append("LOW_TEXT_XLSX")
+            return out, meta
+        except Exception:
+            pass  # fall back to openpyxl
 
-            reader = csv.reader(io.StringIO(text), delimiter=delim)
-            out_lines = []
-            for i, row in enumerate(reader):
-                if i > 3000:
-                    out_lines.append("[TRUNCATED: too many rows]")
-                    break
-                # Keep rows bounded
-                row = [cell.strip() for cell in row[:60] if cell and cell.strip()]
-                if row:
-                    out_lines.append(" | ".join(row))
-            return _cap("\n".join(out_lines))
+    meta["methods_tried"].append("xlsx:openpyxl")
+    if openpyxl is None:
+        meta["quality_flags"].append("XLSX_PARSER_MISSING")
+        return "", meta
+    try:
+        out = _cap("\n".join(_xlsx_parts_openpyxl(data, MAX_XLSX_ROWS_PER_SHEET, MAX_XLSX_CELLS_PER_ROW)))
+        meta["chosen_method"] = "xlsx:openpyxl"
+        meta["text_len"] = len(out)
+        if meta["text_len"] < 200:
+            meta["quality_flags"].append("LOW_TEXT_XLSX")
+        return out, meta
+    except Exception:
+        meta["quality_flags"].append("XLSX_EXTRACT_FAILED")
+        return "", meta
+
+# -------------------------
+# CSV / TSV
+# -------------------------
+def _extract_csv(filename: str, ext: str, data: UploadSource, meta: dict) -> tuple[str, dict]:
+    meta["methods_tried"].append("csv:sniff")
+    try:
+        text = _decode_text(_src_bytes(data))
+        sample = text[:4096]
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=[",", "\t", ";", "|"])
+            delim = dialect.delimiter
         except Exception:
-            # Last resort decode
-            return _cap(_decode_bytes(data))
+            delim = "\t" if ext == ".tsv" else ","
 
-    # -------------------------
-    # Plain text-like
-    # -------------------------
-    if name.endswith((".txt", ".md", ".json", ".yaml", ".yml", ".log")):
-        return _cap(_decode_bytes(data))
+        out_lines = _csv_lines(text, delim, MAX_CSV_ROWS, MAX_CSV_COLS)
 
-    # -------------------------
-    # Images (OCR)
-    # -------------------------
-    if name.endswith((".png", ".jpg", ".jpeg", ".webp")):
-        t = _extract_image_ocr(data)
-        return _cap(t)
+        out = _cap("\n".join(out_lines))
+        meta["chosen_method"] = "csv:tsv" if delim == "\t" else "csv:delim"
+        meta["text_len"] = len(out)
+        if meta["text_len"] < 200:
+            meta["quality_flags"].append("LOW_TEXT_CSV")
+        return out, meta
+    except Exception:
+        out = _cap(_decode_text(_src_bytes(data)))
+        meta["chosen_method"] = "csv:decode_fallback"
+        meta["text_len"] = len(out)
+        return out, meta
 
-    # -------------------------
-    # Fallback
-    # -------------------------
-    if _is_probably_binary(data):
-        # Don't attempt to "decode" arbitrary binaries meaningfully
-        return ""
-    return _cap(_decode_bytes(data))
+# -------------------------
+# Plain text-like
+# -------------------------
+def _extract_plain(filename: str, ext: str, data: UploadSource, meta: dict) -> tuple[str, dict]:
+    meta["methods_tried"].append("text:decode")
+    out = _cap(_decode_text(_src_bytes(data)))
+    meta["chosen_method"] = "text:decode"
+    meta["text_len"] = len(out)
+    return out, meta
+
+# -------------------------
+# Images (OCR)
+# -------------------------
+def _extract_image(filename: str, ext: str, data: UploadSource, meta: dict) -> tuple[str, dict]:
+    meta["methods_tried"].append("img:ocr")
+    out = _cap(_ocr_image_bytes(data))
+    meta["chosen_method"] = "img:ocr"
+    meta["text_len"] = len(out)
+    if meta["text_len"] < 50:
+        meta["quality_flags"].append("LOW_TEXT_IMAGE_OCR")
+    return out, meta
 
-def _extract_text_with_meta(filename: str, data: bytes) -> tuple[str, dict]:
+# Suffix -> handler; `_extract_text_with_meta` looks the upload up here
+# after magic-byte sniffing, and anything else takes the fallback.
+_EXTRACTORS: Dict[str, Callable[[str, str, UploadSource, dict], Tuple[str, dict]]] = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".xlsx": _extract_xlsx,
+    ".csv": _extract_csv,
+    ".tsv": _extract_csv,
+    ".txt": _extract_plain,
+    ".md": _extract_plain,
+    ".json": _extract_plain,
+    ".yaml": _extract_plain,
+    ".yml": _extract_plain,
+    ".log": _extract_plain,
+    ".png": _extract_image,
+    ".jpg": _extract_image,
+    ".jpeg": _extract_image,
+    ".webp": _extract_image,
+}
+
+def _extract_text_with_meta(filename: str, data: UploadSource) -> tuple[str, dict]:
     """
+    Extract usable text from common file types with fallbacks.
+    `data` is the upload's bytes or the path of a spooled copy.
+    - PDFs: PyMuPDF -> pypdf -> pdfplumber -> OCR (optional) if still too short
+    - DOCX: paragraphs + tables
+    - XLSX: all sheets, row-wise
+    - CSV/TSV: delimiter sniff + robust decoding
+    - Images: OCR (optional)
+
     Returns (text, meta). Meta includes:
     - methods_tried
     - chosen_method
@@ -427,20 +1344,6 @@ def _extract_text_with_meta(filename: str, data: bytes) -> tuple[str, dict]:
 
     name = (filename or "").lower().strip()
 
-    # ---- Tuning knobs ----
-    MAX_TEXT_CHARS = 250_000
-    PDF_MIN_TEXT_CHARS = 3000
-
-    OCR_DPI = 300
-    OCR_HEAD_PAGES = 4
-    OCR_TAIL_PAGES = 4
-    OCR_MAX_TOTAL_PAGES = 12  # safety
-
-    MAX_XLSX_ROWS_PER_SHEET = 2000
-    MAX_XLSX_CELLS_PER_ROW = 50
-    MAX_CSV_ROWS = 3000
-    MAX_CSV_COLS = 60
-
     meta = {
         "filename": filename,
         "ext": name.split(".")[-1] if "." in name else "",
@@ -451,346 +1354,150 @@ def _extract_text_with_meta(filename: str, data: bytes) -> tuple[str, dict]:
         "hints": {},
     }
 
-    def cap(s: str) -> str:
-        s = (s or "").strip()
-        if len(s) > MAX_TEXT_CHARS:
-            return s[:MAX_TEXT_CHARS]
-        return s
-
-    def decode_bytes(b: bytes) -> str:
-        for enc in ("utf-8-sig", "utf-8", "cp1252", "latin-1"):
-            try:
-                return b.decode(enc)
-            except Exception:
-                continue
-        return b.decode("utf-8", errors="ignore")
-
-    def is_probably_binary(b: bytes) -> bool:
-        return b.count(b"\x00") > 10
-
-    def money_signals(s: str) -> bool:
-        if not s:
-            return False
-        s2 = s.lower()
-        patterns = [
-            r"₹", r"\$", r"\binr\b", r"\busd\b", r"\brs\.?\b", r"\bgst\b", r"\btax\b",
-            r"\btotal\b", r"\bsubtotal\b", r"\bgrand total\b", r"\bamount\b",
-            r"\bquotation\b", r"\binvoice\b", r"\bpricing\b",
-            r"\b\d{1,3}(,\d{3})+(\.\d+)?\b",  # 1,23,456 style
-            r"\b\d+\.\d+\b",
-        ]
-        return any(re.search(p, s2) for p in patterns)
-
-    def quote_like_filename(n: str) -> bool:
-        return bool(re.search(r"(quote|quotation|invoice|pricing|estimate|proposal)", n.lower()))
-
-    # --- PDF extractors ---
-    def pdf_pypdf(b: bytes) -> str:
-        meta["methods_tried"].append("pdf:pypdf")
-        if PdfReader is None:
-            return ""
-        try:
-            reader = PdfReader(io.BytesIO(b))
-            parts = []
-            for page in reader.pages:
-                t = (page.extract_text() or "").strip()
-                if t:
-                    parts.append(t)
-            return "\n\n".join(parts).strip()
-        except Exception:
-            return ""
-
-    def pdf_plumber(b: bytes) -> str:
-        meta["methods_tried"].append("pdf:pdfplumber")
-        if pdfplumber is None:
-            return ""
-        try:
-            parts = []
-            with pdfplumber.open(io.BytesIO(b)) as pdf:
-                for page in pdf.pages:
-                    t = (page.extract_text() or "").strip()
-                    if t:
-                        parts.append(t)
-            return "\n\n".join(parts).strip()
-        except Exception:
-            return ""
-
-    def image_ocr(img_bytes: bytes) -> str:
-        if pytesseract is None or Image is None:
-            return ""
-        try:
-            img = Image.open(io.BytesIO(img_bytes))
-            txt = pytesseract.image_to_string(img)
-            return (txt or "").strip()
-        except Exception:
-            return ""
-
-    def pdf_ocr_first_last(b: bytes) -> str:
-        """
-        OCR first N pages and last N pages.
-        Uses pdftoppm (poppler-utils) -> PNG -> pytesseract.
-        """
-        meta["methods_tried"].append("pdf:ocr_first_last")
-        if pytesseract is None or Image is None:
-            return ""
-
-        import tempfile, subprocess, os
-
-        try:
-            with tempfile.TemporaryDirectory() as td:
-                pdf_path = os.path.join(td, "in.pdf")
-                with open(pdf_path, "wb") as f:
-                    f.write(b)
-
-                # Determine page count (best-effort)
-                # If PdfReader exists, use it to count pages; else assume OCR_HEAD+OCR_TAIL.
-                page_count = None
-                try:
-                    if PdfReader is not None:
-                        reader = PdfReader(io.BytesIO(b))
-                        page_count = len(reader.pages)
-                except Exception:
-                    page_count = None
-
-                head_n = OCR_HEAD_PAGES
-                tail_n = OCR_TAIL_PAGES
-
-                if page_count is not None:
-                    # cap total OCR pages
-                    if head_n + tail_n > OCR_MAX_TOTAL_PAGES:
-                        head_n = min(head_n, OCR_MAX_TOTAL_PAGES)
-                        tail_n = max(0, OCR_MAX_TOTAL_PAGES - head_n)
-                    tail_start = max(1, page_count - tail_n + 1)
-                else:
-                    # unknown count: just OCR first OCR_MAX_TOTAL_PAGES pages
-                    head_n = min(head_n + tail_n, OCR_MAX_TOTAL_PAGES)
-                    tail_n = 0
-                    tail_start = None
-
-                parts = []
-
-                # OCR head pages
-                if head_n > 0:
-                    out_prefix = os.path.join(td, "head")
-                    cmd = ["pdftoppm", "-r", str(OCR_DPI), "-png", "-f", "1", "-l", str(head_n), pdf_path, out_prefix]
-                    subprocess.run(cmd, check=True, capture_output=True)
-
-                    for i in range(1, head_n + 1):
-                        img_path = f"{out_prefix}-{i}.png"
-                        if not os.path.exists(img_path):
-                            break
-                        with open(img_path, "rb") as imf:
-                            t = image_ocr(imf.read())
-                        if t:
-                            parts.append(f"[OCR Head Page {i}]\n{t}")
-
-                # OCR tail pages
-                if tail_n > 0 and tail_start is not None:
-                    out_prefix = os.path.join(td, "tail")
-                    cmd = ["pdftoppm", "-r", str(OCR_DPI), "-png", "-f", str(tail_start), "-l", str(page_count), pdf_path, out_prefix]
-                    subprocess.run(cmd, check=True, capture_output=True)
-
-                    # tail images start at 1 in output naming
-                    for i in range(1, tail_n + 1):
-                        img_path = f"{out_prefix}-{i}.png"
-                        if not os.path.exists(img_path):
-                            break
-                        with open(img_path, "rb") as imf:
-                            t = image_ocr(imf.read())
-                        if t:
-                            parts.append(f"[OCR Tail Page {tail_start + i - 1}]\n{t}")
-
-                return "\n\n".join(parts).strip()
+    sniffed = _sniff_ext(data)
+    if sniffed == ".ole":
+        meta["methods_tried"].append("sniff:ole")
+        meta["chosen_method"] = "fallback:binary"
+        meta["quality_flags"].append("BINARY_UNSUPPORTED")
+        return "", meta
+    if sniffed is not None and not name.endswith(_SNIFF_EXTS[sniffed]):
+        # Route by content; _EXTRACTORS dispatches on `name`
+        meta["hints"]["sniffed_type"] = sniffed[1:]
+        name += sniffed
 
-        except Exception:
-            return ""
+    ext = os.path.splitext(name)[1]
+    handler = _EXTRACTORS.get(ext)
+    if handler is not None:
+        return handler(filename, ext, data, meta)
 
     # -------------------------
-    # PDF
+    # Fallback
     # -------------------------
-    if name.endswith(".pdf"):
-        t1 = pdf_pypdf(data)
-        best = t1
-        best_method = "pdf:pypdf"
-
-        if len(best) < PDF_MIN_TEXT_CHARS:
-            t2 = pdf_plumber(data)
-            if len(t2) > len(best):
-                best = t2
-                best_method = "pdf:pdfplumber"
-
-        if len(best) < PDF_MIN_TEXT_CHARS:
-            t3 = pdf_ocr_first_last(data)
-            if len(t3) > len(best):
-                best = t3
-                best_method = "pdf:ocr_first_last"
+    if _is_probably_binary(data):
+        meta["methods_tried"].append("fallback:binary")
+        meta["chosen_method"] = "fallback:binary"
+        meta["text_len"] = 0
+        meta["quality_flags"].append("BINARY_UNSUPPORTED")
+        return "", meta
 
-        best = cap(best)
-        meta["chosen_method"] = best_method
-        meta["text_len"] = len(best)
+    meta["methods_tried"].append("fallback:decode")
+    out = _cap(_decode_text(_src_bytes(data)))
+    meta["chosen_method"] = "fallback:decode"
+    meta["text_len"] = len(out)
+    return out, meta
 
-        # Quality flags + UX hints (Option A + C)
-        if meta["text_len"] < PDF_MIN_TEXT_CHARS:
-            meta["quality_flags"].append("LOW_TEXT_PDF")
 
-        if quote_like_filename(filename):
-            meta["hints"]["quote_like_filename"] = True
-            if not money_signals(best):
-                meta["quality_flags"].append("LIKELY_QUOTE_PRICING_NOT_EXTRACTED")
+# -------------------- Extraction cache --------------------
+# Content-addressed: identical uploads (retries, demo re-uploads, duplicate
+# quotes) skip PDF parsing/OCR. In-process LRU first, then an optional
+# diskcache shared by all workers on the box.
+EXTRACT_CACHE_MAX = 256
+_EXTRACT_CACHE: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+_EXTRACT_LOCK = threading.Lock()
 
-        return best, meta
+_EXTRACT_DISK = None
+if diskcache is not None:
+    try:
+        _EXTRACT_DISK = diskcache.Cache(os.getenv("EXTRACT_CACHE_DIR", "/tmp/caio-extract"))
+    except Exception:
+        _EXTRACT_DISK = None
 
-    # -------------------------
-    # DOCX (paragraphs + tables)
-    # -------------------------
-    if name.endswith(".docx"):
-        meta["methods_tried"].append("docx:python-docx")
-        if docx is None:
-            meta["quality_flags"].append("DOCX_PARSER_MISSING")
-            return "", meta
+def _extract_cache_key(filename: str, data: UploadSource) -> str:
+    # Extension decides the extractor, so it is part of the key
+    name = (filename or "").lower().strip()
+    ext = name.rsplit(".", 1)[-1] if "." in name else ""
+    # blake2b: faster than sha256 in software and plenty for a cache key
+    if isinstance(data, (bytes, bytearray)):
+        h = hashlib.blake2b(data, digest_size=16)
+    else:
+        h = hashlib.blake2b(digest_size=16)
+        with open(data, "rb") as f:
+            for chunk in iter(partial(f.read, 1 << 20), b""):
+                h.update(chunk)
+    return f"{h.hexdigest()}:{ext}"
+
+def _extract_cache_get(key: str, filename: str) -> Optional[tuple[str, dict]]:
+    with _EXTRACT_LOCK:
+        hit = _EXTRACT_CACHE.get(key)
+        if hit is not None:
+            _EXTRACT_CACHE.move_to_end(key)
+    if hit is None and _EXTRACT_DISK is not None:
         try:
-            d = docx.Document(io.BytesIO(data))
-            parts = []
-
-            for p in d.paragraphs:
-                txt = (p.text or "").strip()
-                if txt:
-                    parts.append(txt)
-
-            for table in d.tables:
-                for row in table.rows:
-                    cells = []
-                    for cell in row.cells:
-                        ct = (cell.text or "").strip()
-                        if ct:
-                            cells.append(ct)
-                    if cells:
-                        parts.append(" | ".join(cells))
-
-            out = cap("\n".join(parts))
-            meta["chosen_method"] = "docx:python-docx"
-            meta["text_len"] = len(out)
-            if meta["text_len"] < 200:
-                meta["quality_flags"].append("LOW_TEXT_DOCX")
-            return out, meta
+            hit = _EXTRACT_DISK.get(key)
         except Exception:
-            meta["quality_flags"].append("DOCX_EXTRACT_FAILED")
-            return "", meta
-
-    # -------------------------
-    # XLSX
-    # -------------------------
-    if name.endswith(".xlsx"):
-        meta["methods_tried"].append("xlsx:openpyxl")
-        if openpyxl is None:
-            meta["quality_flags"].append("XLSX_PARSER_MISSING")
-            return "", meta
+            hit = None
+    if hit is None:
+        return None
+
+    text, meta = hit
+    meta = copy.deepcopy(meta)
+    meta["filename"] = filename
+    meta["cache"] = "hit"
+    return text, meta
+
+def _extract_cache_put(key: str, text: str, meta: dict) -> None:
+    entry = (text, copy.deepcopy(meta))
+    with _EXTRACT_LOCK:
+        _EXTRACT_CACHE[key] = entry
+        _EXTRACT_CACHE.move_to_end(key)
+        while len(_EXTRACT_CACHE) > EXTRACT_CACHE_MAX:
+            _EXTRACT_CACHE.popitem(last=False)
+    if _EXTRACT_DISK is not None:
         try:
-            wb = openpyxl.load_workbook(io.BytesIO(data), data_only=True)
-            parts = []
-            for sheet in wb.worksheets:
-                parts.append(f"[Sheet: {sheet.title}]")
-                row_count = 0
-                for row in sheet.iter_rows(values_only=True):
-                    if row_count >= MAX_XLSX_ROWS_PER_SHEET:
-                        parts.append("[TRUNCATED: too many rows]")
-                        break
-                    row_count += 1
-
-                    cells = []
-                    for c in row[:MAX_XLSX_CELLS_PER_ROW]:
-                        if c is None:
-                            continue
-                        s = str(c).strip()
-                        if s:
-                            cells.append(s)
-                    if cells:
-                        parts.append(" | ".join(cells))
-
-            out = cap("\n".join(parts))
-            meta["chosen_method"] = "xlsx:openpyxl"
-            meta["text_len"] = len(out)
-            if meta["text_len"] < 200:
-                meta["quality_flags"].append("LOW_TEXT_XLSX")
-            return out, meta
+            _EXTRACT_DISK.set(key, entry)
         except Exception:
-            meta["quality_flags"].append("XLSX_EXTRACT_FAILED")
-            return "", meta
+            pass
 
-    # -------------------------
-    # CSV / TSV
-    # -------------------------
-    if name.endswith((".csv", ".tsv")):
-        meta["methods_tried"].append("csv:sniff")
+def _extract_text_with_meta_cached(filename: str, data: bytes) -> tuple[str, dict]:
+    key = _extract_cache_key(filename, data)
+    hit = _extract_cache_get(key, filename)
+    if hit is not None:
+        return hit
+    text, meta = _extract_text_with_meta(filename, data)
+    _extract_cache_put(key, text, meta)
+    meta["cache"] = "miss"
+    return text, meta
+
+
+def _load_json_packet(fp) -> Any:
+    if ijson is not None:
+        return next(ijson.items(fp, "", use_float=True))
+    return json.load(fp)
+
+def _spool_to_disk(fp, suffix: str) -> Tuple[str, int]:
+    """Copy an upload stream to a named temp file in 1 MB chunks; (path, size)."""
+    fp.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tf:
+        shutil.copyfileobj(fp, tf, length=1 << 20)
+        return tf.name, tf.tell()
+
+async def extract_many(files: List[Tuple[str, UploadSource]]) -> List[tuple[str, dict]]:
+    """
+    Extract (text, meta) for several uploads in parallel, preserving order.
+    Each upload is (filename, bytes or spooled path); paths are handed to the
+    workers as-is, so the file body never crosses the process boundary.
+    Cache hits are served in-process; misses go to the extraction pool.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def one(filename: str, data: UploadSource) -> tuple[str, dict]:
+        key = await loop.run_in_executor(None, _extract_cache_key, filename, data)
+        hit = _extract_cache_get(key, filename)
+        if hit is not None:
+            return hit
+        pool = _EXTRACT_POOL
         try:
-            text = decode_bytes(data)
-            sample = text[:4096]
-            try:
-                dialect = csv.Sniffer().sniff(sample, delimiters=[",", "\t", ";", "|"])
-                delim = dialect.delimiter
-            except Exception:
-                delim = "\t" if name.endswith(".tsv") else ","
+            text, meta = await loop.run_in_executor(pool, _extract_text_with_meta, filename, data)
+        except BrokenProcessPool:
+            # a worker died (OOM / parser crash): later uploads get a fresh
+            # pool, this one is parsed in-process
+            _replace_extract_pool(pool)
+            text, meta = await loop.run_in_executor(None, _extract_text_with_meta, filename, data)
+        _extract_cache_put(key, text, meta)
+        meta["cache"] = "miss"
+        return text, meta
 
-            rdr = csv.reader(io.StringIO(text), delimiter=delim)
-            out_lines = []
-            for i, row in enumerate(rdr):
-                if i >= MAX_CSV_ROWS:
-                    out_lines.append("[TRUNCATED: too many rows]")
-                    break
-                row = [(c or "").strip() for c in row[:MAX_CSV_COLS]]
-                row = [c for c in row if c]
-                if row:
-                    out_lines.append(" | ".join(row))
-
-            out = cap("\n".join(out_lines))
-            meta["chosen_method"] = "csv:tsv" if delim == "\t" else "csv:delim"
-            meta["text_len"] = len(out)
-            if meta["text_len"] < 200:
-                meta["quality_flags"].append("LOW_TEXT_CSV")
-            return out, meta
-        except Exception:
-            out = cap(decode_bytes(data))
-            meta["chosen_method"] = "csv:decode_fallback"
-            meta["text_len"] = len(out)
-            return out, meta
-
-    # -------------------------
-    # Plain text-like
-    # -------------------------
-    if name.endswith((".txt", ".md", ".json", ".yaml", ".yml", ".log")):
-        meta["methods_tried"].append("text:decode")
-        out = cap(decode_bytes(data))
-        meta["chosen_method"] = "text:decode"
-        meta["text_len"] = len(out)
-        return out, meta
-
-    # -------------------------
-    # Images (OCR)
-    # -------------------------
-    if name.endswith((".png", ".jpg", ".jpeg", ".webp")):
-        meta["methods_tried"].append("img:ocr")
-        out = cap(image_ocr(data))
-        meta["chosen_method"] = "img:ocr"
-        meta["text_len"] = len(out)
-        if meta["text_len"] < 50:
-            meta["quality_flags"].append("LOW_TEXT_IMAGE_OCR")
-        return out, meta
-
-    # -------------------------
-    # Fallback
-    # -------------------------
-    if is_probably_binary(data):
-        meta["methods_tried"].append("fallback:binary")
-        meta["chosen_method"] = "fallback:binary"
-        meta["text_len"] = 0
-        meta["quality_flags"].append("BINARY_UNSUPPORTED")
-        return "", meta
-
-    meta["methods_tried"].append("fallback:decode")
-    out = cap(decode_bytes(data))
-    meta["chosen_method"] = "fallback:decode"
-    meta["text_len"] = len(out)
-    return out, meta
+    return list(await asyncio.gather(*(one(n, d) for n, d in files)))
 
 
 # -------------------- Routes --------------------
@@ -806,31 +1513,17 @@ def health():
 def welcome():
     return {"ok": True, "message": "Welcome to CAIO BOS"}
 
-@app.post("/run-ea")
-def run_ea(payload: EARequest):
-    # --- Guard: prevent empty Decision Review packets (avoid timeouts / fluff) ---
-    pkt = payload.packet or {}
-    # --- Force models by mode ---
-    meta = pkt.get("meta") or {}
-    mode = meta.get("mode")
-    
-    # Default: Executive Action Plan model
-    forced_model = "qwen2.5:3b-instruct"
-    
-    # Decision Review uses a different model (Pro feature)
-    if mode in ("decision_review_from_plan", "decision_review"):
-        forced_model = "phi3:mini"
+# Brains whose packet insights count as EA input
+_BRAIN_KEYS = frozenset(("cfo", "cmo", "coo", "chro", "cpo", "ea"))
 
+def _require_ea_input(pkt: Dict[str, Any]) -> None:
+    """Guard: prevent empty Decision Review packets (avoid timeouts / fluff)."""
     findings = pkt.get("findings") or []
     insights_map = pkt.get("insights") or {}
     document_text = (pkt.get("document_text") or pkt.get("text") or "").strip()
 
-    has_insights = False
     if isinstance(insights_map, dict):
-        for b in ["cfo", "cmo", "coo", "chro", "cpo", "ea"]:
-            if insights_map.get(b):
-                has_insights = True
-                break
+        has_insights = any(insights_map.get(b) for b in _BRAIN_KEYS)
     else:
         has_insights = bool(insights_map)
 
@@ -840,71 +1533,153 @@ def run_ea(payload: EARequest):
             detail="Decision Review requires findings/insights or document_text. Upload a file (Analyze) or provide a populated validator packet."
         )
 
-    # Charge credits (if configured)
+def _is_legacy_ea(payload: EARequest) -> bool:
+    """The body is the former api.main shape: overrides, no user_id."""
+    return payload.user_id is None and payload.overrides is not None
+
+def _require_user(payload: EARequest) -> None:
+    if payload.user_id is None:
+        raise HTTPException(status_code=422, detail="user_id is required")
+
+async def _run_ea_legacy(payload: EARequest) -> ORJSONResponse:
+    """The former api.main /run-ea: overrides applied as given, full bundle back."""
+    ov = payload.overrides or Overrides()
+    deadline = (ov.timeout_sec or 300) * 3
     try:
-        charge_bos_run(payload.user_id, payload.plan_tier)
-    except InsufficientCreditsError as e:
-        raise HTTPException(status_code=402, detail=str(e))
-    except Exception:
-        # If charging fails, still allow run; you can tighten later
-        pass
+        bundle = await asyncio.wait_for(
+            orchestrate.run_ea_inproc(
+                payload.packet or {},
+                cfg=SLM_CFG,
+                model=ov.model,
+                timeout_sec=ov.timeout_sec,
+                num_predict=ov.num_predict,
+                ea_min_predict=LEGACY_EA_MIN_PREDICT,
+            ),
+            timeout=deadline,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"EA run gave no result within {deadline}s")
+    # Explicit response skips jsonable_encoder's walk over the large per_brain dict
+    return ORJSONResponse(bundle)
 
-    # Save packet to temp file
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False, mode="w", encoding="utf-8") as tf:
-        json.dump(payload.packet, tf, ensure_ascii=False, indent=2)
-        tmp_in = tf.name
+@app.post("/run-ea", dependencies=rate_limit(5))
+async def run_ea(payload: EARequest, request: Request):
+    if _is_legacy_ea(payload):
+        return await _run_ea_legacy(payload)
+    _require_user(payload)
 
-    out = run_slm(
-        tmp_in,
-        "ea",
-        model=PRIMARY_EA_MODEL,
-        timeout_sec=payload.timeout_sec,
-        num_predict=payload.num_predict,
-    )
+    # Clients that accept SSE get per-brain results as they finish
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return await run_ea_stream(payload)
+
+    pkt = payload.packet or {}
+    # --- Force models by mode ---
+    meta = pkt.get("meta") or {}
+    mode = meta.get("mode")
     
-    ui_obj = out.get("ui") if isinstance(out, dict) else None
-    is_fail = (
-        (isinstance(out, dict) and out.get("error"))
-        or (isinstance(ui_obj, dict) and ui_obj.get("error"))
-    )
-    if is_fail:
-        out2 = run_slm(
-            tmp_in,
+    # Default: Executive Action Plan model
+    forced_model = "qwen2.5:3b-instruct"
+    
+    # Decision Review uses a different model (Pro feature)
+    if mode in ("decision_review_from_plan", "decision_review"):
+        forced_model = "phi3:mini"
+
+    _require_ea_input(pkt)
+
+    # Debit up front; refunded below if the run (and its fallback) fails
+    reserved = await _reserve_credits(payload.user_id, "ea")
+    try:
+        out = await run_slm_async(
+            pkt,
             "ea",
-            model=FALLBACK_EA_MODEL,
+            model=PRIMARY_EA_MODEL,
             timeout_sec=payload.timeout_sec,
             num_predict=payload.num_predict,
         )
-        out = out2
 
+        if _slm_failed(out):
+            out2 = await run_slm_async(
+                pkt,
+                "ea",
+                model=FALLBACK_EA_MODEL,
+                timeout_sec=payload.timeout_sec,
+                num_predict=payload.num_predict,
+            )
+            out = out2
+    except BaseException:
+        _refund_credits(payload.user_id, "ea", reserved)
+        raise
+
+    if _slm_failed(out):
+        _refund_credits(payload.user_id, "ea", reserved)
 
+    if "error" in out and "ui" not in out:
+        return {"ui": out}
+    return out
 
-@app.post("/run-brain")
-def run_brain(payload: BrainRequest):
-    # Charge credits (if configured)
-    try:
-        charge_bos_run(payload.user_id, payload.plan_tier)
-    except InsufficientCreditsError as e:
-        raise HTTPException(status_code=402, detail=str(e))
-    except Exception:
-        pass
 
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False, mode="w", encoding="utf-8") as tf:
-        json.dump(payload.packet, tf, ensure_ascii=False, indent=2)
-        tmp_in = tf.name
+@app.post("/run-ea-stream", dependencies=rate_limit(5))
+async def run_ea_stream(payload: EARequest):
+    """
+    Same input as /run-ea, streamed as server-sent events: one `brain` event
+    per CXO pass as it finishes, then a final `ea` event with the
+    {"ui", "per_brain"} bundle (or an `error` event).
+    """
+    _require_user(payload)
+    pkt = payload.packet or {}
+    _require_ea_input(pkt)
+    reserved = await _reserve_credits(payload.user_id, "ea")
 
-    out = run_slm(
-        tmp_in,
-        payload.brain,
-        model=payload.model,
-        timeout_sec=payload.timeout_sec,
-        num_predict=payload.num_predict,
+    async def gen():
+        ok = False
+        try:
+            async for event, data in orchestrate.stream_ea_inproc(
+                pkt,
+                cfg=SLM_CFG,
+                model=PRIMARY_EA_MODEL,
+                timeout_sec=payload.timeout_sec,
+                num_predict=payload.num_predict,
+            ):
+                if event == "ea":
+                    ok = not _slm_failed(data["ui"])
+                yield b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+        except Exception as e:
+            err = {"error": "SLM failed", "stdout": "", "stderr": f"{type(e).__name__}: {e}"}
+            yield b"event: error\ndata: " + orjson.dumps(err) + b"\n\n"
+        finally:
+            # failed, errored or disconnected before the final event
+            if not ok:
+                _refund_credits(payload.user_id, "ea", reserved)
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@app.post("/run-brain", dependencies=rate_limit(20))
+async def run_brain(payload: BrainRequest):
+    # Debit up front; refunded below if the run fails
+    reserved = await _reserve_credits(payload.user_id, payload.brain)
+    try:
+        out = await run_slm_async(
+            payload.packet,
+            payload.brain,
+            model=payload.model,
+            timeout_sec=payload.timeout_sec,
+            num_predict=payload.num_predict,
+        )
+    except BaseException:
+        _refund_credits(payload.user_id, payload.brain, reserved)
+        raise
+    if _slm_failed(out):
+        _refund_credits(payload.user_id, payload.brain, reserved)
     if "error" in out and "ui" not in out:
         return {"ui": out}
     return out
 
-@app.post("/upload-and-ea")
+@app.post("/upload-and-ea", dependencies=rate_limit(5))
 async def upload_and_ea(
     file: UploadFile = File(...),
     timeout_sec: int = 300,
@@ -920,16 +1695,19 @@ async def upload_and_ea(
     Returns: {"ui": ...} compatible with BOSSummary.
     """
     filename = file.filename or "upload"
-    raw = await file.read()
     model=PRIMARY_EA_MODEL
 
     # JSON packet path (backward compatible)
+    # Parse straight from the spooled upload; never materialize the raw bytes.
     if filename.lower().endswith(".json"):
-        with tempfile.NamedTemporaryFile(suffix=".json", delete=False, mode="wb") as tf:
-            tf.write(raw)
-            tmp_in = tf.name
-        out = run_slm(
-            tmp_in,
+        try:
+            await file.seek(0)
+            # Parsing a large packet is CPU/disk work; keep it off the event loop
+            pkt = await asyncio.get_running_loop().run_in_executor(None, _load_json_packet, file.file)
+        except Exception as e:
+            return {"ui": {"error": "Invalid JSON packet", "stdout": "", "stderr": str(e)}}
+        out = await run_slm_async(
+            pkt,
             "ea",
             model=model,
             timeout_sec=timeout_sec,
@@ -940,7 +1718,20 @@ async def upload_and_ea(
         return {"ui": out.get("ui") or out}
 
     # Document path (PDF/DOCX/TXT/other)
-    text, extract_meta = _extract_text_with_meta(filename, raw)
+    # Copy the upload to a named temp file and let the parsers open it by
+    # path: the body is never materialized in this process, and the spool is
+    # gone before the long SLM call.
+    suffix = os.path.splitext(filename)[1][:16]
+    loop = asyncio.get_running_loop()
+    tmp_path, size_bytes = await loop.run_in_executor(None, _spool_to_disk, file.file, suffix)
+    try:
+        (text, extract_meta), = await extract_many([(filename, tmp_path)])
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        await file.close()
     
     print(
     f"[UPLOAD] filename={filename} "
@@ -950,7 +1741,8 @@ async def upload_and_ea(
 
     print(f"[EXTRACT] chosen={extract_meta.get('chosen_method')} flags={extract_meta.get('quality_flags')}")
 
-    if not text or len(text.strip()) < 20:
+    # extractors return stripped text (_cap), so no strip() copy here
+    if len(text) < 20:
         return {
             "ui": {
                 "error": "No readable text extracted from upload",
@@ -959,28 +1751,29 @@ async def upload_and_ea(
             }
         }
 
-    # Wrap extracted text into a packet JSON for EA
+    # Wrap extracted text into a packet JSON for EA. Slice once; the
+    # preview comes from the capped text, not another pass over `text`.
+    doc_text_len = len(text)
+    doc = text[:200000]  # safety cap
+    del text
     packet: Dict[str, Any] = {
         "label": "Uploaded Document",
         "source": {
             "filename": filename,
             "content_type": file.content_type,
-            "size_bytes": len(raw),
+            "size_bytes": size_bytes,
         },
-        "document_text": text[:200000],  # safety cap
+        "document_text": doc,
         "facts": {},
-        "meta": {"ingest": "upload-and-ea"},
+        "meta": {
+            "ingest": "upload-and-ea",
+            "doc_text_len": doc_text_len,
+            "doc_text_preview": doc[:400],
+        },
     }
-    
-    packet["meta"]["doc_text_len"] = len(text)
-    packet["meta"]["doc_text_preview"] = text[:400]
-
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False, mode="w", encoding="utf-8") as tf:
-        json.dump(packet, tf, ensure_ascii=False, indent=2)
-        tmp_in = tf.name
 
-    out = run_slm(
-        tmp_in,
+    out = await run_slm_async(
+        packet,
         "ea",
         model=PRIMARY_EA_MODEL,
         timeout_sec=timeout_sec,
@@ -994,8 +1787,8 @@ async def upload_and_ea(
         or (isinstance(ui_obj, dict) and ui_obj.get("error"))
     )
     if is_fail:
-        out2 = run_slm(
-            tmp_in,
+        out2 = await run_slm_async(
+            packet,
             "ea",
             model=FALLBACK_EA_MODEL,
             timeout_sec=timeout_sec,
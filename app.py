@@ -3,23 +3,45 @@
 CAIO BOS – Executive Assistant (EA) Demo
 Local subprocess or API mode, robust JSON parsing + rich render
 """
-import json, os, sys, subprocess, tempfile
+import copy, hashlib, json, os, re, signal, sys, subprocess, threading, time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
 import streamlit as st
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx  # optional: HTTP/2 keep-alive client for the API POST
+except Exception:
+    httpx = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_pretty(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str).decode("utf-8")
+except Exception:
+    orjson = None
+    _json_loads = json.loads
+
+    def _json_pretty(obj) -> str:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=str)
 
 st.set_page_config(page_title="CAIO BOS – EA Demo", layout="wide")
 st.title("CAIO BOS – Executive Assistant (EA) Demo")
 
 # ----------------- Controls -----------------
-mode = st.radio("Run mode", ["API (FastAPI server)", "Local (subprocess)"], horizontal=True, index=1)
-api_base = st.text_input("API base URL (for API mode)", os.getenv("SLM_API", "http://127.0.0.1:8000"))
-model_override = st.text_input("Optional model override (e.g., 'qwen2.5:1.5b-instruct')", "")
+mode = st.radio("Run mode", ["API (FastAPI server)", "Local (subprocess)"], horizontal=True, index=1, key="mode")
+api_base = st.text_input("API base URL (for API mode)", os.getenv("SLM_API", "http://127.0.0.1:8000"), key="api_base")
+model_override = st.text_input("Optional model override (e.g., 'qwen2.5:1.5b-instruct')", "", key="model_override")
 c1, c2 = st.columns(2)
 with c1:
-    timeout_sec = st.number_input("Timeout (sec)", min_value=30, max_value=900, value=300, step=30)
+    timeout_sec = st.number_input("Timeout (sec)", min_value=30, max_value=900, value=300, step=30, key="timeout_sec")
 with c2:
-    num_predict = st.number_input("num_predict", min_value=64, max_value=2048, value=512, step=64)
+    num_predict = st.number_input("num_predict", min_value=64, max_value=2048, value=512, step=64, key="num_predict")
 
 st.markdown("### Input packet")
 tab1, tab2 = st.tabs(["Paste JSON", "Upload .json"])
@@ -29,70 +51,144 @@ with tab1:
     pkt_text = st.text_area(
         "Validator packet (JSON)",
         height=240,
-        placeholder='{"findings":[...],"insights":{...},"bos_index":0.0,...}'
+        placeholder='{"findings":[...],"insights":{...},"bos_index":0.0,...}',
+        key="pkt_text",
     )
 
 with tab2:
-    up = st.file_uploader("Upload JSON file (validator packet)", type=["json"])
+    up = st.file_uploader("Upload JSON file (validator packet)", type=["json"], key="pkt_upload")
     if up:
         pkt_text = up.getvalue().decode("utf-8", errors="ignore")
 
 
 # ----------------- Helpers -----------------
-def find_repo_root(start: Path) -> Path:
-    cur = start
+# Streamlit re-executes this script on every interaction, so a plain
+# lru_cache would be rebuilt each rerun; st.cache_data persists across them.
+@st.cache_data(show_spinner=False)
+def find_repo_root(start: str) -> Path:
+    cur = Path(start)
     for _ in range(6):
         if (cur / "slm" / "run_slm.py").exists():
             return cur
         cur = cur.parent
-    return start
+    return Path(start)
+
+REPO_ROOT = find_repo_root(str(Path(__file__).resolve().parent))
+# Fixed part of the local EA command; per-run args are appended.
+BASE_CMD = (sys.executable, "-m", "slm.run_slm", "--brain", "ea", "--config", "slm/config/models.yaml")
+
+_RAW_DECODER = json.JSONDecoder()
 
 def parse_json_loose(txt: str):
     """Return last balanced JSON object from arbitrary text."""
     try:
-        return json.loads(txt)
+        return _json_loads(txt)
     except Exception:
         pass
 
-    start_idx, depth, last_valid = None, 0, None
-    for i, ch in enumerate(txt):
-        if ch == "{":
-            if depth == 0:
-                start_idx = i
-            depth += 1
-        elif ch == "}":
-            if depth > 0:
-                depth -= 1
-                if depth == 0 and start_idx is not None:
-                    candidate = txt[start_idx:i+1]
-                    try:
-                        last_valid = json.loads(candidate)
-                    except Exception:
-                        pass
-    if last_valid is not None:
-        return last_valid
-    raise ValueError("Could not parse JSON from subprocess output.")
+    # One forward pass: the C decoder consumes each object whole, so nested
+    # braces are never re-tried; on a failed start, jump to the next "{".
+    last = None
+    idx = txt.find("{")
+    while idx != -1:
+        try:
+            last, end = _RAW_DECODER.raw_decode(txt, idx)
+        except ValueError:
+            end = idx + 1
+        idx = txt.find("{", end)
+    if last is None:
+        raise ValueError("Could not parse JSON from subprocess output.")
+    return last
+
+# The SLM run gets its own process group, so a timeout takes down anything it
+# spawned too instead of leaving it holding the model in memory.
+if os.name == "nt":
+    _GROUP_KW = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    _GROUP_KW = {"start_new_session": True}
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    try:
+        if os.name == "nt":
+            proc.send_signal(signal.CTRL_BREAK_EVENT)
+            proc.kill()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, OSError):
+        pass  # already gone
+
+_SLM_LINE_RE = re.compile(r"(?m)^[^\S\n]*\[SLM\][^\n]*(?:\n|$)")
 
 def strip_slm_logs(s: str) -> str:
     """Drop lines like: [SLM] Calling Ollama ..."""
-    return "\n".join(line for line in s.splitlines() if not line.strip().startswith("[SLM]"))
-
-def ollama_up(base="http://127.0.0.1:11434"):
+    return _SLM_LINE_RE.sub("", s)
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Keep-alive pool to the API / Ollama, kept across Streamlit reruns."""
+    adapter = HTTPAdapter(
+        pool_connections=4, pool_maxsize=8,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+    )
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+@st.cache_resource
+def get_httpx():
+    """HTTP/2 client for /run-ea (HTTP/1.1 without h2); None without httpx."""
+    if httpx is None:
+        return None
+    limits = httpx.Limits(max_keepalive_connections=4)
+    try:
+        return httpx.Client(http2=True, limits=limits, timeout=httpx.Timeout(None))
+    except ImportError:  # http2 needs the h2 package
+        return httpx.Client(limits=limits, timeout=httpx.Timeout(None))
+
+@st.cache_resource
+def _api_runs():
+    """Pool for /run-ea POSTs plus the in-flight ones by request key, shared
+    by every session and rerun so identical clicks wait on one request."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="ea-api"), {}, threading.Lock()
+
+@st.cache_resource
+def _ea_results():
+    """Finished EA results by request key, shared by every session and rerun.
+    A plain store rather than st.cache_data: the runs draw status/warning
+    elements, which cache_data would replay on every hit."""
+    return TTLCache(maxsize=64, ttl=3600), threading.Lock()
+
+@st.cache_data(ttl=10, show_spinner=False)
+def ollama_up(base="http://127.0.0.1:11434") -> bool:
+    # Short TTL: reruns skip the probe, but starting Ollama is seen within 10s
     try:
-        r = requests.get(base.rstrip("/") + "/api/tags", timeout=2)
+        r = get_session().get(base.rstrip("/") + "/api/tags", timeout=2)
         return r.ok
     except Exception:
         return False
 
+def _as_list(v) -> list:
+    if not v:
+        return []
+    return v if isinstance(v, list) else [v]
+
+# Missing UI fields; factories give each payload its own list/dict
+_UI_DEFAULTS = (
+    ("executive_summary", "—"),
+    ("top_priorities", list),
+    ("cross_brain_actions_7d", list),
+    ("cross_brain_actions_30d", list),
+    ("key_risks", list),
+    ("owner_matrix", dict),
+)
+
 def ensure_ui_shape(ui: dict) -> dict:
     if not isinstance(ui, dict):
         return {"executive_summary": str(ui), "_meta": {"engine": "ollama", "model": "unknown", "confidence": 0.0}}
-    ui.setdefault("executive_summary", "—")
-    ui.setdefault("top_priorities", [])
-    ui.setdefault("cross_brain_actions_7d", [])
-    ui.setdefault("cross_brain_actions_30d", [])
-    ui.setdefault("key_risks", [])
-    ui.setdefault("owner_matrix", {})
+    for k, default in _UI_DEFAULTS:
+        if k not in ui:
+            ui[k] = default() if callable(default) else default
     ui.setdefault("_meta", {"engine": "ollama", "model": "unknown", "confidence": ui.get("confidence", 0.0)})
 
     # Accept common aliases / coercions
@@ -100,15 +196,105 @@ def ensure_ui_shape(ui: dict) -> dict:
         ui["top_priorities"] = ui.pop("priorities")
     if not ui["key_risks"] and ui.get("risks"):
         ui["key_risks"] = ui.pop("risks")
-    for k in ("top_priorities", "cross_brain_actions_7d", "cross_brain_actions_30d", "key_risks"):
-        if isinstance(ui[k], str):
-            ui[k] = [ui[k]]
-    if isinstance(ui["owner_matrix"], (list, str)):
-        ui["owner_matrix"] = {"EA": ui["owner_matrix"] if isinstance(ui["owner_matrix"], list) else [ui["owner_matrix"]]}
+
+    # Canonicalize once here so rendering is pure reads: every action/risk
+    # field is a list, owner_matrix is {owner: [items]}, and top_priorities
+    # is one {"brain", "actions_7d", "actions_30d"} dict per pane.
+    for k in ("cross_brain_actions_7d", "cross_brain_actions_30d", "key_risks"):
+        ui[k] = _as_list(ui[k])
+    owners = ui["owner_matrix"] or {}
+    if isinstance(owners, (list, str)):
+        owners = {"EA": owners}
+    ui["owner_matrix"] = {brain: _as_list(items) for brain, items in owners.items()}
+    tops = normalize_top(ui["top_priorities"])
+    for item in tops:
+        item["actions_7d"] = _as_list(item.get("actions_7d"))
+        item["actions_30d"] = _as_list(item.get("actions_30d"))
+    ui["top_priorities"] = tops
     return ui
 
 
 # ----------------- Rendering -----------------
+def normalize_top(x):
+    out = []
+    if isinstance(x, dict):
+        for k, v in x.items():
+            if isinstance(v, dict):
+                d = {"brain": k}; d.update(v); out.append(d)
+            elif isinstance(v, list):
+                out.append({"brain": k, "actions_7d": v})
+            elif isinstance(v, str):
+                out.append({"brain": k, "actions_7d": [v]})
+    elif isinstance(x, list):
+        for it in x:
+            if isinstance(it, dict): out.append(it)
+            elif isinstance(it, str): out.append({"brain": "EA", "actions_7d": [it]})
+    elif isinstance(x, str):
+        out.append({"brain": "EA", "actions_7d": [x]})
+    return out
+
+# Each section is its own fragment, so a rerun triggered inside one island
+# re-executes only that island instead of the whole render.
+@st.fragment
+def _render_top_priorities(ui: dict):
+    st.divider()
+    st.subheader("Top Priorities by Brain")
+
+    # Content-keyed containers keep each pane's identity stable across reruns
+    # (and drop exact duplicates) so Streamlit only redraws changed panes.
+    seen = set()
+    for item in ui["top_priorities"]:
+        h = hashlib.blake2b(repr(sorted(item.items())).encode("utf-8"), digest_size=8).hexdigest()
+        if h in seen:
+            continue
+        seen.add(h)
+        brain = item.get("brain", "Unknown")
+        with st.container(key=f"tp_{h}"), st.expander(f"🧠 {brain}"):
+            a7, a30 = item["actions_7d"], item["actions_30d"]
+            md = []
+            if a7:
+                md += ["**Next 7 days**", "\n".join([f"- {x}" for x in a7])]
+            if a30:
+                md += ["**Next 30 days**", "\n".join([f"- {x}" for x in a30])]
+            st.markdown("\n\n".join(md) if md else "—")
+
+# The sections below each go out as one markdown element (divider and
+# heading included) instead of a Streamlit call per line.
+@st.fragment
+def _render_cross_brain(ui: dict):
+    c7, c30 = ui["cross_brain_actions_7d"], ui["cross_brain_actions_30d"]
+    if c7 or c30:
+        md = ["---", "### Cross-Brain Actions"]
+        if c7:  md += ["**7-Day**", "\n".join([f"- {x}" for x in c7])]
+        if c30: md += ["**30-Day**", "\n".join([f"- {x}" for x in c30])]
+        st.markdown("\n\n".join(md))
+
+@st.fragment
+def _render_risks(ui: dict):
+    risks = ui["key_risks"]
+    if risks:
+        st.markdown("---\n\n### Key Risks\n\n" + "\n".join([f"- {x}" for x in risks]))
+
+@st.fragment
+def _render_owner_matrix(ui: dict):
+    owners = ui["owner_matrix"]
+    if owners:
+        md = ["---", "### Owner Matrix"]
+        for brain, items in owners.items():
+            md += [f"**{brain}**", "\n".join([f"- {x}" for x in items if x])]
+        st.markdown("\n\n".join(md))
+
+@st.fragment
+def _render_per_brain_raw(per_brain: dict):
+    st.markdown("---\n\n### Per-Brain Outputs (raw)")
+    for b in ["cfo", "cmo", "coo", "chro", "cpo"]:
+        if b in per_brain:
+            with st.expander(b.upper()):
+                # Expander bodies always execute, so the dump sits behind a
+                # toggle; flipping it reruns only this fragment.
+                if st.toggle("Show raw JSON", key=f"raw_{b}"):
+                    st.code(_json_pretty(per_brain[b]))
+
 def render_ui(payload: dict):
     """Accept either {ui, per_brain} bundle or a bare UI dict."""
     ui = payload.get("ui") if isinstance(payload, dict) else payload
@@ -133,160 +319,210 @@ def render_ui(payload: dict):
     with c3:
         st.write("**Engine:**", ui.get("_meta", {}).get("engine", "—"))
 
-    st.divider()
-    st.subheader("Top Priorities by Brain")
-
-    def normalize_top(x):
-        out = []
-        if isinstance(x, dict):
-            for k, v in x.items():
-                if isinstance(v, dict):
-                    d = {"brain": k}; d.update(v); out.append(d)
-                elif isinstance(v, list):
-                    out.append({"brain": k, "actions_7d": v})
-                elif isinstance(v, str):
-                    out.append({"brain": k, "actions_7d": [v]})
-        elif isinstance(x, list):
-            for it in x:
-                if isinstance(it, dict): out.append(it)
-                elif isinstance(it, str): out.append({"brain": "EA", "actions_7d": [it]})
-        elif isinstance(x, str):
-            out.append({"brain": "EA", "actions_7d": [x]})
-        return out
-
-    for item in normalize_top(ui.get("top_priorities", [])):
-        brain = item.get("brain", "Unknown")
-        with st.expander(f"🧠 {brain}"):
-            a7  = item.get("actions_7d")  or []
-            a30 = item.get("actions_30d") or []
-            if isinstance(a7, str): a7 = [a7]
-            if isinstance(a30, str): a30 = [a30]
-            if a7:
-                st.markdown("**Next 7 days**")
-                st.markdown("\n".join(f"- {x}" for x in a7))
-            if a30:
-                st.markdown("**Next 30 days**")
-                st.markdown("\n".join(f"- {x}" for x in a30))
-            if not a7 and not a30:
-                st.write("—")
-
-    c7  = ui.get("cross_brain_actions_7d")  or []
-    c30 = ui.get("cross_brain_actions_30d") or []
-    if isinstance(c7, str): c7 = [c7]
-    if isinstance(c30, str): c30 = [c30]
-    if c7 or c30:
-        st.divider(); st.subheader("Cross-Brain Actions")
-        if c7:  st.markdown("**7-Day**");  st.markdown("\n".join(f"- {x}" for x in c7))
-        if c30: st.markdown("**30-Day**"); st.markdown("\n".join(f"- {x}" for x in c30))
-
-    risks = ui.get("key_risks") or []
-    if isinstance(risks, str): risks = [risks]
-    if risks:
-        st.divider(); st.subheader("Key Risks")
-        st.markdown("\n".join(f"- {x}" for x in risks))
-
-    owners = ui.get("owner_matrix") or {}
-    if isinstance(owners, (list, str)): owners = {"EA": owners if isinstance(owners, list) else [owners]}
-    if owners:
-        st.divider(); st.subheader("Owner Matrix")
-        for brain, items in owners.items():
-            items = items if isinstance(items, list) else [items]
-            st.markdown(f"**{brain}**")
-            st.markdown("\n".join(f"- {x}" for x in items if x))
+    _render_top_priorities(ui)
+    _render_cross_brain(ui)
+    _render_risks(ui)
+    _render_owner_matrix(ui)
 
     # Per-brain raw (if bundle provided)
     per_brain = payload.get("per_brain") if isinstance(payload, dict) else None
     if per_brain:
-        st.divider(); st.subheader("Per-Brain Outputs (raw)")
-        for b in ["cfo", "cmo", "coo", "chro", "cpo"]:
-            if b in per_brain:
-                with st.expander(b.upper()):
-                    st.code(json.dumps(per_brain[b], indent=2, ensure_ascii=False))
+        _render_per_brain_raw(per_brain)
 
 
 # ----------------- Run -----------------
+class EARunError(Exception):
+    """A failed EA run; `logs` maps expander title -> raw text to show with it."""
+
+    def __init__(self, msg: str, logs: dict = None, cmd: str = None, warn: bool = False):
+        super().__init__(msg)
+        self.logs = logs or {}
+        self.cmd = cmd
+        self.warn = warn
+
+
+def _run_ea_api(pkt_text: str, model_override: str, timeout_sec: int, num_predict: int, api_base: str) -> dict:
+    # New API contract
+    payload = {
+        "packet": _json_loads(pkt_text),
+        "overrides": {
+            "model": model_override or None,
+            "timeout_sec": int(timeout_sec),
+            "num_predict": int(num_predict),
+        }
+    }
+    # The POST runs on a background thread while this one polls it and keeps
+    # the status current; an identical request already in flight is joined.
+    key = hashlib.blake2b(
+        "\0".join([pkt_text, model_override, str(timeout_sec), str(num_predict), api_base]).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    pool, inflight, lock = _api_runs()
+    with lock:
+        fut = inflight.get(key)
+        if fut is None:
+            client = get_httpx() or get_session()
+            fut = inflight[key] = pool.submit(
+                client.post, f"{api_base.rstrip('/')}/run-ea", json=payload, timeout=timeout_sec+15,
+            )
+            fut.add_done_callback(lambda _: inflight.pop(key, None))
+
+    status = st.status("Running EA via API...")
+    t0, shown = time.monotonic(), 0
+    while not fut.done():
+        elapsed = int(time.monotonic() - t0)
+        if elapsed != shown:
+            shown = elapsed
+            status.update(label=f"Running EA via API... {elapsed}s")
+        time.sleep(0.25)
+
+    try:
+        r = fut.result()
+        r.raise_for_status()
+        out = _json_loads(r.content)  # bundle or bare ui
+    except Exception as e:
+        status.update(label="API run failed", state="error")
+        raise EARunError(f"API error: {e}")
+    status.update(label="API run finished", state="complete")
+    return out if isinstance(out, dict) else {"ui": out}
+
+
+def _run_ea_local(pkt_text: str, model_override: str, timeout_sec: int, num_predict: int) -> dict:
+    # Local subprocess (module run)
+    if not ollama_up():
+        st.warning("Ollama not reachable at http://127.0.0.1:11434 — start it or pull the model.")
+
+    # Packet goes to the SLM process on stdin ("--input -"): no temp file
+    cmd = [
+        *BASE_CMD,
+        "--input", "-",
+        "--timeout", str(int(timeout_sec)),
+        "--num_predict", str(int(num_predict)),
+    ]
+    if model_override:
+        cmd += ["--model", model_override]
+    cmd_str = " ".join(map(str, cmd))
+
+    # Stream stdout so [SLM] progress shows live instead of blocking
+    # on the whole run.
+    status = st.status("Starting local EA run...")
+    try:
+        proc = subprocess.Popen(
+            cmd, cwd=str(REPO_ROOT),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            **_GROUP_KW,
+        )
+    except Exception as e:
+        status.update(label="Local run failed", state="error")
+        raise EARunError(f"Local run error: {e}", cmd=cmd_str)
+
+    # stderr drains on its own thread so neither pipe can fill and
+    # stall the child; the timer kills the run at the deadline.
+    err_chunks = []
+    err_reader = threading.Thread(target=lambda: err_chunks.append(proc.stderr.read()), daemon=True)
+    err_reader.start()
+    expired = threading.Event()
+    timer = threading.Timer(timeout_sec + 30, lambda: (expired.set(), kill_process_group(proc)))
+    timer.start()
+
+    out_lines = []
+    try:
+        try:
+            # pkt_text already parsed as valid JSON: send it as-is, no re-encode
+            proc.stdin.write(pkt_text.encode("utf-8"))
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass  # child exited early; stderr says why
+        for raw in proc.stdout:
+            line = raw.decode("utf-8", errors="replace")
+            out_lines.append(line)
+            if line.lstrip().startswith("[SLM]"):
+                status.update(label=line.strip())
+        proc.wait()
+    finally:
+        timer.cancel()
+        err_reader.join()
+
+    if expired.is_set():
+        status.update(label="Local run timed out", state="error")
+        raise EARunError("Local run timed out — try a smaller model or a longer timeout.", cmd=cmd_str)
+    status.update(label="Local run finished", state="complete" if proc.returncode == 0 else "error")
+
+    raw_out = "".join(out_lines).strip()
+    raw_err = b"".join(err_chunks).decode("utf-8", errors="replace").strip()
+    clean_out = strip_slm_logs(raw_out)
+
+    if proc.returncode != 0:
+        raise EARunError(
+            f"Subprocess error ({proc.returncode}). See raw logs below.",
+            logs={"Raw stderr": raw_err, "Raw stdout": raw_out}, cmd=cmd_str,
+        )
+
+    # parse_json_loose already tries a whole-buffer parse first
+    try:
+        parsed = parse_json_loose(clean_out)
+    except Exception:
+        parsed = None
+
+    if not parsed:
+        raise EARunError(
+            "EA returned empty or non-JSON output. See raw logs below.",
+            logs={"Raw stdout": raw_out, "Raw stderr": raw_err}, cmd=cmd_str, warn=True,
+        )
+    return parsed if isinstance(parsed, dict) else {"ui": parsed}
+
+
+def run_ea(mode: str, pkt_text: str, model_override: str, timeout_sec: int, num_predict: int,
+           api_base: str, use_cache: bool = True) -> dict:
+    """
+    Identical (packet, settings) re-runs come straight from _ea_results();
+    use_cache=False re-runs this one request and refreshes its entry. Failed
+    runs raise and are never stored.
+    """
+    key = hashlib.blake2b(
+        "\0".join([mode, pkt_text, model_override, str(timeout_sec), str(num_predict), api_base]).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    results, lock = _ea_results()
+    if use_cache:
+        with lock:
+            hit = results.get(key)
+        if hit is not None:
+            return copy.deepcopy(hit)  # rendering normalizes the payload in place
+
+    if mode.startswith("API"):
+        out = _run_ea_api(pkt_text, model_override, timeout_sec, num_predict, api_base)
+    else:
+        out = _run_ea_local(pkt_text, model_override, timeout_sec, num_predict)
+    with lock:
+        results[key] = copy.deepcopy(out)
+    return out
+
+
 st.markdown("—")
-go = st.button("Generate EA Plan", type="primary", use_container_width=True)
+ignore_cache = st.checkbox("Ignore cache (re-run even if this packet was just run)", value=False, key="ignore_cache")
+go = st.button("Generate EA Plan", type="primary", use_container_width=True, key="generate")
 
 if go:
     if not pkt_text:
         st.error("Please paste or upload a validator JSON packet."); st.stop()
     try:
-        pkt = json.loads(pkt_text)
+        _json_loads(pkt_text)
     except Exception as e:
         st.error(f"Invalid JSON: {e}"); st.stop()
 
     with st.spinner("Running EA..."):
-        if mode.startswith("API"):
-            # New API contract
-            payload = {
-                "packet": pkt,
-                "overrides": {
-                    "model": model_override or None,
-                    "timeout_sec": int(timeout_sec),
-                    "num_predict": int(num_predict),
-                }
-            }
-            try:
-                r = requests.post(f"{api_base.rstrip('/')}/run-ea", json=payload, timeout=timeout_sec+15)
-                r.raise_for_status()
-                out = r.json()  # bundle or bare ui
-                render_ui(out if isinstance(out, dict) else {"ui": out})
-            except Exception as e:
-                st.error(f"API error: {e}")
-        else:
-            # Local subprocess (module run)
-            repo_root = find_repo_root(Path(__file__).resolve().parent)
-            if not ollama_up():
-                st.warning("Ollama not reachable at http://127.0.0.1:11434 — start it or pull the model.")
-
-            with tempfile.NamedTemporaryFile(suffix=".json", delete=False, mode="w", encoding="utf-8") as tf:
-                json.dump(pkt, tf, indent=2); tf.flush()
-                tmp_in = tf.name
-
-            cmd = [
-                sys.executable, "-m", "slm.run_slm",
-                "--input", tmp_in,
-                "--brain", "ea",
-                "--config", "slm/config/models.yaml",
-                "--timeout", str(int(timeout_sec)),
-                "--num_predict", str(int(num_predict)),
-            ]
-            if model_override:
-                cmd += ["--model", model_override]
-
-            try:
-                proc = subprocess.run(cmd, cwd=str(repo_root), capture_output=True, text=True, timeout=timeout_sec+30)
-            except subprocess.TimeoutExpired:
-                st.error("Local run timed out — try a smaller model or a longer timeout.")
-                st.expander("Command used").write(" ".join(map(str, cmd))); st.stop()
-            except Exception as e:
-                st.error(f"Local run error: {e}")
-                st.expander("Command used").write(" ".join(map(str, cmd))); st.stop()
-
-            raw_out = (proc.stdout or "").strip()
-            raw_err = (proc.stderr or "").strip()
-            clean_out = strip_slm_logs(raw_out)
-
-            if proc.returncode != 0:
-                st.error(f"Subprocess error ({proc.returncode}). See raw logs below.")
-                with st.expander("Raw stderr"): st.code(raw_err or "(empty)")
-                with st.expander("Raw stdout"): st.code(raw_out or "(empty)")
-                st.expander("Command used").write(" ".join(map(str, cmd))); st.stop()
-
-            parsed = None
-            try:
-                parsed = parse_json_loose(clean_out)
-            except Exception:
-                try:
-                    parsed = json.loads(clean_out)
-                except Exception:
-                    parsed = None
-
-            if not parsed:
-                st.warning("EA returned empty or non-JSON output. See raw logs below.")
-                with st.expander("Raw stdout"): st.code(raw_out or "(empty)")
-                with st.expander("Raw stderr"): st.code(raw_err or "(empty)")
-                st.expander("Command used").write(" ".join(map(str, cmd))); st.stop()
-
-            render_ui(parsed if isinstance(parsed, dict) else {"ui": parsed})
+        try:
+            result = run_ea(
+                mode, pkt_text, model_override, int(timeout_sec), int(num_predict), api_base,
+                use_cache=not ignore_cache,
+            )
+        except EARunError as e:
+            (st.warning if e.warn else st.error)(str(e))
+            for title, text in e.logs.items():
+                with st.expander(title): st.code(text or "(empty)")
+            if e.cmd:
+                st.expander("Command used").write(e.cmd)
+            st.stop()
+
+    render_ui(result)
@@ -10,29 +10,72 @@ Created on Mon Dec  1 18:28:53 2025
 """
 Central gate for BOS usage.
 
-Every BOS / EA analysis endpoint should call `charge_bos_run()`
-BEFORE invoking the SLM engine.
+Every BOS / EA analysis endpoint should call `reserve_bos_run()` BEFORE
+invoking the SLM engine (debits and commits), then `refund_bos_run()` if
+the run fails. Failed runs are not billed.
 
 Responsibilities:
-- Read plan_tier
+- Read plan_tier (stored users.tier)
+- Refund runs that failed
 - Look up tier config (credits per analysis, daily cap)
 - Check wallet balance
 - Enforce Demo daily doc cap
 - Deduct credits + increment usage_daily + log credit_transactions
 """
 
-from typing import Optional
+import datetime as dt
+import logging
+import threading
+from typing import Optional, Tuple
 
+from cachetools import TTLCache
 from fastapi import HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from db import SessionLocal
+from routes_bos_auth import User
 from wallet import (
     consume_credits_and_record_usage,
+    refund_credits_and_usage,
     InsufficientCreditsError,
     DailyLimitReachedError,
 )
 from tier_config import TIER_CONFIG
 
+log = logging.getLogger(__name__)
+
+# user_id -> tier from the users table; tier changes apply within a few minutes
+_USER_TIERS: TTLCache = TTLCache(maxsize=4096, ttl=300)
+_USER_TIERS_LOCK = threading.Lock()
+
+
+def lookup_plan_tier(user_id: Optional[int]) -> str:
+    """
+    Server-side plan tier for `user_id` (users.tier), never the client's
+    claim. Unknown users and lookup failures get "demo".
+    """
+    if user_id is None:
+        return "demo"
+    with _USER_TIERS_LOCK:
+        tier = _USER_TIERS.get(user_id)
+    if tier is not None:
+        return tier
+
+    db = SessionLocal()
+    try:
+        tier = db.execute(select(User.tier).where(User.id == user_id)).scalar_one_or_none()
+    except Exception:
+        log.exception("Tier lookup failed for user %s", user_id)
+        return "demo"
+    finally:
+        db.close()
+
+    tier = (tier or "demo").lower().strip()
+    with _USER_TIERS_LOCK:
+        _USER_TIERS[user_id] = tier
+    return tier
+
 
 def charge_bos_run(
     db: Session,
@@ -41,6 +84,7 @@ def charge_bos_run(
     plan_tier: Optional[str],
     brain: str,
     doc_increment: int = 1,
+    for_date: Optional[dt.date] = None,
 ) -> int:
     """
     Apply the BOS usage gate:
@@ -74,6 +118,7 @@ def charge_bos_run(
             gateway="system",
             metadata={"endpoint": "bos", "brain": brain, "tier": tier_key},
             daily_doc_cap=daily_cap,
+            for_date=for_date,
         )
         # DO NOT commit here – caller (endpoint) is responsible for db.commit()
     except InsufficientCreditsError as e:
@@ -82,3 +127,76 @@ def charge_bos_run(
         raise HTTPException(status_code=429, detail=str(e))
 
     return credits_required
+
+
+def reserve_bos_run(
+    *,
+    user_id: int,
+    brain: str,
+    doc_increment: int = 1,
+) -> Tuple[int, dt.date]:
+    """
+    Debit a run before it starts, on a short-lived session (for
+    run_in_executor). The wallet row is locked for the debit, so concurrent
+    requests cannot all pass on the same balance or daily cap. The tier is
+    the user's stored one (lookup_plan_tier), not the client's claim.
+
+    Returns:
+        (credits debited, usage_daily date they were counted on); pass both
+        to refund_bos_run() if the run fails.
+
+    Raises:
+        HTTPException 402 / 429 as charge_bos_run().
+    """
+    usage_date = dt.date.today()
+    db = SessionLocal()
+    try:
+        used = charge_bos_run(
+            db,
+            user_id=user_id,
+            plan_tier=lookup_plan_tier(user_id),
+            brain=brain,
+            doc_increment=doc_increment,
+            for_date=usage_date,
+        )
+        db.commit()
+        return used, usage_date
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def refund_bos_run(
+    *,
+    user_id: int,
+    brain: str,
+    credits: int,
+    usage_date: dt.date,
+    doc_increment: int = 1,
+) -> None:
+    """
+    Give back a reservation from reserve_bos_run() for a run that failed.
+    The usage_daily row of `usage_date` (the reservation's day, even if the
+    run ended after midnight) is rolled back. Runs on its own session and
+    commits; never raises (failures are logged).
+    """
+    db = SessionLocal()
+    try:
+        refund_credits_and_usage(
+            db=db,
+            user_id=user_id,
+            credits=credits,
+            doc_increment=doc_increment,
+            reason=f"{brain}_refund",
+            gateway="system",
+            metadata={"endpoint": "bos", "brain": brain},
+            for_date=usage_date,
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        log.exception("Failed to refund BOS run for user %s (%s)", user_id, brain)
+    finally:
+        db.close()
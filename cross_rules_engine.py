@@ -10,12 +10,22 @@ names differ, expand evaluator.formula_registry.FORMULA_MAP aliases.
 """
 
 from __future__ import annotations
-import os, glob, math, traceback
+import os, glob, hashlib, math, threading, traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple, Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import numpy as np
 import pandas as pd
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YLoader  # libyaml: tokenizes in C
+except ImportError:
+    from yaml import SafeLoader as _YLoader
+
 # ---------------------------------------------
 # Optional alias map from your repo (used if present)
 # ---------------------------------------------
@@ -33,34 +43,100 @@ except Exception:
 def _lc(s: str) -> str:
     return s.strip().lower().replace(" ", "_").replace("-", "_")
 
-def _all_columns(df: pd.DataFrame) -> Dict[str, str]:
-    return {_lc(c): c for c in df.columns}
+@dataclass
+class BrainView:
+    """A brain's frame plus its normalized column index, built once per run."""
+    df: pd.DataFrame
+    lc_map: Dict[str, str]            # normalized name -> original name
+    lc_items: List[Tuple[str, str]]   # lc_map as a list, for substring scans
+    cols: Dict[Tuple[str, ...], Optional[str]] = field(default_factory=dict)
+    numeric: Dict[Tuple[str, Optional[float]], pd.Series] = field(default_factory=dict)
+
+class RunViews(dict):
+    """
+    brain -> BrainView for one evaluation, plus every view the run built,
+    keyed by id(df). Each view holds its frame, so an id cannot be reused
+    while the run lives; the memo goes away with the run, and overlapping
+    runs never see each other's entries.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.by_id: Dict[int, BrainView] = {}
+
+# The run the current thread is evaluating (set by _evaluate / _run_rule)
+_RUN = threading.local()
+
+@contextmanager
+def _in_run(views: RunViews):
+    prev = getattr(_RUN, "views", None)
+    _RUN.views = views
+    try:
+        yield
+    finally:
+        _RUN.views = prev
+
+def _brain_view(df: pd.DataFrame) -> BrainView:
+    run = getattr(_RUN, "views", None)
+    by_id = run.by_id if run is not None else {}  # outside a run: not memoized
+    v = by_id.get(id(df))
+    if v is not None and v.df is df:
+        return v
+    lc_map = {_lc(c): c for c in df.columns}
+    v = by_id[id(df)] = BrainView(df, lc_map, list(lc_map.items()))
+    return v
 
-def _find_one(df: pd.DataFrame, keys: List[str]) -> Optional[str]:
-    """Resolve a single column name using FORMULA_MAP and fuzzy matching."""
-    if df is None or df.empty:
-        return None
-    lc_map = _all_columns(df)
+def _all_columns(df: pd.DataFrame) -> Dict[str, str]:
+    return _brain_view(df).lc_map
 
-    # candidate alias pool
+@lru_cache(maxsize=512)
+def _alias_pool(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Normalized candidate names for `keys`, FORMULA_MAP aliases included."""
     pool: List[str] = []
     for k in keys:
         pool.append(k)
         for a in FORMULA_MAP.get(k, []):
             pool.append(a)
-    pool = list({_lc(x) for x in pool})
+    return tuple({_lc(x) for x in pool})
 
+def _resolve_column(view: BrainView, pool: Tuple[str, ...]) -> Optional[str]:
     # exact
+    lc_map = view.lc_map
     for a in pool:
         if a in lc_map:
             return lc_map[a]
     # contains
     for a in pool:
-        for k, orig in lc_map.items():
+        for k, orig in view.lc_items:
             if a in k or k in a:
                 return orig
     return None
 
+def _find_one(df: pd.DataFrame, keys: List[str]) -> Optional[str]:
+    """Resolve a single column name using FORMULA_MAP and fuzzy matching."""
+    if df is None or df.empty:
+        return None
+    view = _brain_view(df)
+    ck = tuple(keys)
+    if ck in view.cols:
+        return view.cols[ck]
+    col = view.cols[ck] = _resolve_column(view, _alias_pool(ck))
+    return col
+
+def _numeric(df: pd.DataFrame, col: str, fill: Optional[float] = 0.0) -> pd.Series:
+    """
+    pd.to_numeric(df[col], errors="coerce"), NaNs filled with `fill` (None
+    keeps them). Memoized on the frame's view, so a column several rules
+    read is coerced once per run; treat the result as read-only.
+    """
+    cache = _brain_view(df).numeric
+    s = cache.get((col, fill))
+    if s is None:
+        s = pd.to_numeric(df[col], errors="coerce")
+        if fill is not None:
+            s = s.fillna(fill)
+        cache[(col, fill)] = s
+    return s
+
 def _find_any(df: pd.DataFrame, key_groups: List[List[str]]) -> Optional[str]:
     """Try a series of key lists until one resolves."""
     for group in key_groups:
@@ -72,21 +148,58 @@ def _find_any(df: pd.DataFrame, key_groups: List[List[str]]) -> Optional[str]:
 def _period_col(df: pd.DataFrame) -> Optional[str]:
     return _find_one(df, ["period", "date", "month", "year_month", "fiscal_period"])
 
-def _pct_change(s: pd.Series) -> pd.Series:
-    with pd.option_context("mode.use_inf_as_na", True):
-        return pd.to_numeric(s, errors="coerce").astype(float).pct_change().replace([pd.NA, pd.NaT], 0).fillna(0)
+def _pct_change(s: pd.Series) -> np.ndarray:
+    """Period-over-period change; NaN/inf (incl. x/0) become 0, gaps are padded."""
+    a = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    gaps = np.isnan(a)
+    if gaps.any():
+        # forward-fill, as Series.pct_change pads before differencing
+        idx = np.where(gaps, 0, np.arange(len(a)))
+        a = a[np.maximum.accumulate(idx)]
+    out = np.zeros_like(a)
+    prev = a[:-1]
+    nz = prev != 0
+    # a/prev - 1, as pandas computes it: (a - prev)/prev rounds differently
+    # and flips exact 5% / 10% moves across the _growth_bool thresholds
+    with np.errstate(invalid="ignore"):
+        np.divide(a[1:], prev, out=out[1:], where=nz)
+        np.subtract(out[1:], 1.0, out=out[1:], where=nz)
+    out[~np.isfinite(out)] = 0.0
+    return out
 
 def _growth_bool(s: pd.Series, up_thresh=0.1, down_thresh=-0.05) -> Tuple[pd.Series, pd.Series]:
     p = _pct_change(s)
-    return (p > up_thresh), (p < down_thresh)
+    # Back on the input's index: evaluators AND masks from different brains,
+    # and pandas aligns those by label where bare arrays would not.
+    return pd.Series(p > up_thresh, index=s.index), pd.Series(p < down_thresh, index=s.index)
+
+def _pearson(x: pd.Series, y: pd.Series) -> float:
+    """Series.corr() equivalent: rows matched by index, non-finite pairs dropped."""
+    x, y = x.align(y, join="inner")
+    a = x.to_numpy(dtype=np.float64, na_value=np.nan)
+    b = y.to_numpy(dtype=np.float64, na_value=np.nan)
+    m = np.isfinite(a) & np.isfinite(b)
+    if np.count_nonzero(m) < 2:
+        return float("nan")
+    a = a[m] - a[m].mean()
+    b = b[m] - b[m].mean()
+    denom = np.sqrt(a @ a) * np.sqrt(b @ b)
+    return float(a @ b / denom) if denom else float("nan")
+
+def _count(mask) -> int:
+    """Number of True entries in a boolean Series/array."""
+    return int(np.count_nonzero(mask))
 
 def _score(status: str) -> float:
     return {"pass": 1.0, "warn": 0.6, "fail": 0.0, "na": 0.0, "error": 0.0}.get(status, 0.0)
 
-def _df_or_none(dfs: Dict[str, pd.DataFrame], key: str) -> Optional[pd.DataFrame]:
+def _df_or_none(dfs: Dict[str, Any], key: str) -> Optional[pd.DataFrame]:
     df = dfs.get(key)
+    # Evaluators only read columns, so the caller's frame is shared, not copied
+    if isinstance(df, BrainView):
+        return df.df
     if isinstance(df, pd.DataFrame) and not df.empty:
-        return df.copy()
+        return df
     return None
 
 def _sort_by_period(df: pd.DataFrame) -> pd.DataFrame:
@@ -94,7 +207,7 @@ def _sort_by_period(df: pd.DataFrame) -> pd.DataFrame:
     if not p:
         return df
     try:
-        return df.assign(__dt=pd.to_datetime(df[p], errors="coerce")).sort_values("__dt").drop(columns="__dt")
+        return df.assign(__dt=pd.to_datetime(df[p], errors="coerce")).sort_values("__dt", kind="stable").drop(columns="__dt")
     except Exception:
         return df
 
@@ -111,20 +224,33 @@ class Rule:
     severity: str
     file_path: str
 
+# path -> (mtime, size, Rule); a file is re-parsed only when either changes
+_RULES_CACHE: "OrderedDict[str, Tuple[float, int, Rule]]" = OrderedDict()
+_RULES_CACHE_MAX = 256
+
 def _load_rules(path: str) -> List[Rule]:
     files = sorted(glob.glob(os.path.join(path, "*.yaml")))
     rules: List[Rule] = []
     for p in files:
+        st = os.stat(p)
+        hit = _RULES_CACHE.get(p)
+        if hit is not None and hit[0] == st.st_mtime and hit[1] == st.st_size:
+            _RULES_CACHE.move_to_end(p)
+            rules.append(hit[2])
+            continue
         with open(p, "r", encoding="utf-8") as fh:
-            y = yaml.safe_load(fh) or {}
-        rules.append(
-            Rule(
-                rule_id=str(y.get("rule_id") or y.get("id") or os.path.basename(p)),
-                title=str(y.get("title", "")),
-                severity=str(y.get("severity", "warn")),
-                file_path=os.path.normpath(p),
-            )
+            y = yaml.load(fh, Loader=_YLoader) or {}
+        rule = Rule(
+            rule_id=str(y.get("rule_id") or y.get("id") or os.path.basename(p)),
+            title=str(y.get("title", "")),
+            severity=str(y.get("severity", "warn")),
+            file_path=os.path.normpath(p),
         )
+        _RULES_CACHE[p] = (st.st_mtime, st.st_size, rule)
+        _RULES_CACHE.move_to_end(p)
+        if len(_RULES_CACHE) > _RULES_CACHE_MAX:
+            _RULES_CACHE.popitem(last=False)
+        rules.append(rule)
     return rules
 
 # ---------------------------------------------
@@ -141,7 +267,7 @@ def _eval_101(dfs):
     s_up, _ = _growth_bool(cmo[spend])
     _, o_down = _growth_bool(coo[orders])
     _, r_down = _growth_bool(cfo[revenue])
-    bad = (s_up & o_down & r_down).sum()
+    bad = _count(s_up & o_down & r_down)
     n = max(len(cmo), len(coo), len(cfo))
     if bad >= max(2, math.ceil(0.3*n)): return ("fail", _score("fail"), f"{bad} adverse funnel periods")
     if bad > 0: return ("warn", _score("warn"), f"{bad} adverse funnel periods")
@@ -153,8 +279,8 @@ def _eval_102(dfs):
     attr = _find_one(cmo, ["attributed_revenue","platform_revenue","mkt_attributed_revenue"])
     rev  = _find_one(cfo, ["revenue","sales","booked_revenue","turnover"])
     if not (attr and rev): return _na("Columns not found (attributed_revenue/revenue)")
-    a = pd.to_numeric(cmo[attr], errors="coerce").sum(skipna=True)
-    r = pd.to_numeric(cfo[rev], errors="coerce").sum(skipna=True)
+    a = _numeric(cmo, attr, None).sum(skipna=True)
+    r = _numeric(cfo, rev, None).sum(skipna=True)
     if pd.isna(a) or pd.isna(r): return _na("Insufficient numeric data")
     if a > r*1.02: return ("fail", _score("fail"), f"Attributed {a:,.0f} > Revenue {r:,.0f}")
     if a > r*0.98: return ("warn", _score("warn"), f"Attributed ≈ Revenue ({a:,.0f} vs {r:,.0f})")
@@ -168,16 +294,16 @@ def _eval_103(dfs):
     attr  = _find_one(cmo, ["attributed_revenue","platform_revenue","mkt_attributed_revenue"])
     gpct  = _find_one(cfo, ["gross_margin_pct","gross_margin_percent","gm_pct"])
     if not (spend and attr): return _na("Columns not found (spend/attributed_revenue)")
-    S = pd.to_numeric(cmo[spend], errors="coerce").fillna(0)
-    A = pd.to_numeric(cmo[attr], errors="coerce").fillna(0)
+    S = _numeric(cmo, spend)
+    A = _numeric(cmo, attr)
     if gpct and gpct in cfo.columns:
-        GM = pd.to_numeric(cfo[gpct], errors="coerce").fillna(0.4)  # default 40%
+        GM = _numeric(cfo, gpct, 0.4)  # default 40%
         g = (A * GM.iloc[:len(A)].reindex_like(A, fill_value=GM.mean())).replace(0, pd.NA)
     else:
         g = A.replace(0, pd.NA)
     payback = (S / g).replace([pd.NA, pd.NaT, pd.Series([float("inf")]*len(S))], pd.NA).fillna(float("inf"))
-    too_low = (payback < 0.2).sum()
-    too_high = (payback > 24).sum()
+    too_low = _count(payback < 0.2)
+    too_high = _count(payback > 24)
     if too_low + too_high >= max(2, math.ceil(0.3*len(payback))): 
         return ("fail", _score("fail"), f"Unrealistic payback in {too_low+too_high} periods")
     if too_low + too_high > 0:
@@ -194,7 +320,7 @@ def _eval_104(dfs):
     o_up,_ = _growth_bool(coo[orders])
     r_up,_ = _growth_bool(coo[returns])
     _, rev_down = _growth_bool(cfo[revenue])
-    bad = (o_up & r_up & rev_down).sum()
+    bad = _count(o_up & r_up & rev_down)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods: returns dampened revenue despite order growth")
     return ("pass", _score("pass"), "No strong returns-dampening pattern")
 
@@ -205,12 +331,12 @@ def _eval_105(dfs):
     hires = _find_one(cpo, ["new_hires","hiring","offers_accepted","joined"])
     exits = _find_one(chro, ["attrition","exits","separations","leavers"])
     if not (head and hires and exits): return _na("Columns not found (headcount/hires/exits)")
-    H = pd.to_numeric(chro[head], errors="coerce").fillna(method="ffill").fillna(0)
-    J = pd.to_numeric(cpo[hires], errors="coerce").reindex(range(len(H)), fill_value=0)
-    X = pd.to_numeric(chro[exits], errors="coerce").reindex(range(len(H)), fill_value=0)
+    H = _numeric(chro, head, None).ffill().fillna(0)
+    J = _numeric(cpo, hires, None).reindex(range(len(H)), fill_value=0)
+    X = _numeric(chro, exits, None).reindex(range(len(H)), fill_value=0)
     dH = H.diff().fillna(0)
     diff = (J - X) - dH
-    off = (diff.abs() > max(1, 0.2 * (H.mean() if H.mean() else 1))).sum()
+    off = _count(diff.abs() > max(1, 0.2 * (H.mean() if H.mean() else 1)))
     if off >= 2: return ("warn", _score("warn"), f"{off} periods where hires-exits ≠ Δheadcount")
     return ("pass", _score("pass"), "Hires - exits aligns with net headcount change")
 
@@ -221,13 +347,13 @@ def _eval_106(dfs):
     payroll = _find_one(cfo, ["payroll_cost","total_payroll","sga_payroll"])
     hires = _find_one(cpo, ["new_hires","hiring","offers_accepted","joined"])
     if not (runway and payroll and hires): return _na("Columns not found (runway/payroll/hires)")
-    R = pd.to_numeric(cfo[runway], errors="coerce").fillna(0)
-    P = pd.to_numeric(cfo[payroll], errors="coerce").fillna(0)
-    H = pd.to_numeric(cpo[hires], errors="coerce").fillna(0)
+    R = _numeric(cfo, runway)
+    P = _numeric(cfo, payroll)
+    H = _numeric(cpo, hires)
     _, r_down = _growth_bool(R, up_thresh=0.05, down_thresh=-0.02)
     p_up,_ = _growth_bool(P)
     h_up,_ = _growth_bool(H)
-    bad = (r_down & p_up & h_up).sum()
+    bad = _count(r_down & p_up & h_up)
     if bad >= 2: return ("fail", _score("fail"), "Runway falling while payroll & hiring rise")
     if bad > 0: return ("warn", _score("warn"), "Runway pressure with payroll/hiring up")
     return ("pass", _score("pass"), "Runway vs payroll/hiring looks OK")
@@ -242,7 +368,7 @@ def _eval_107(dfs):
     s_up,_ = _growth_bool(cmo[spend])
     h_up,_ = _growth_bool(cpo[hc])
     _, o_down = _growth_bool(coo[orders])
-    bad = (s_up & h_up & o_down).sum()
+    bad = _count(s_up & h_up & o_down)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods show efficiency paradox")
     return ("pass", _score("pass"), "No persistent efficiency paradox")
 
@@ -254,13 +380,13 @@ def _eval_108(dfs):
     fin = _find_one(cfo, ["financing_cashflow","financing_cash_flow","cashflow_financing"])
     net = _find_one(cfo, ["net_change_in_cash","net_change_cash","net_cash_change"])
     if not all([op, inv, fin, net]): return _na("Required columns not found (op, inv, fin, net)")
-    co = pd.to_numeric(cfo[op], errors="coerce").fillna(0)
-    ci = pd.to_numeric(cfo[inv], errors="coerce").fillna(0)
-    cf = pd.to_numeric(cfo[fin], errors="coerce").fillna(0)
-    cn = pd.to_numeric(cfo[net], errors="coerce").fillna(0)
+    co = _numeric(cfo, op)
+    ci = _numeric(cfo, inv)
+    cf = _numeric(cfo, fin)
+    cn = _numeric(cfo, net)
     delta = (co + ci + cf) - cn
     tol = (cn.abs()*0.05).clip(lower=1.0)
-    bad = (delta.abs() > tol).sum()
+    bad = _count(delta.abs() > tol)
     if bad >= max(1, math.ceil(0.2*len(cn))): return ("fail", _score("fail"), f"{bad} periods violate cashflow identity")
     if bad > 0: return ("warn", _score("warn"), f"{bad} borderline periods")
     return ("pass", _score("pass"), "Cashflow identity holds")
@@ -273,7 +399,7 @@ def _eval_109(dfs):
     if not (spend and gmpct): return _na("Columns not found (spend/gross_margin_pct)")
     s_up,_ = _growth_bool(cmo[spend], up_thresh=0.05)
     _, gm_down = _growth_bool(cfo[gmpct], down_thresh=-0.01)
-    bad = (s_up & gm_down).sum()
+    bad = _count(s_up & gm_down)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods of margin compression with rising spend")
     return ("pass", _score("pass"), "No persistent margin compression from spend")
 
@@ -285,7 +411,7 @@ def _eval_110(dfs):
     if not (attr and backlog): return _na("Columns not found (attrition/backlog)")
     a_up,_ = _growth_bool(chro[attr], up_thresh=0.02)
     b_up,_ = _growth_bool(coo[backlog], up_thresh=0.05)
-    bad = (a_up & b_up).sum()
+    bad = _count(a_up & b_up)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods where attrition likely driving backlog")
     return ("pass", _score("pass"), "Attrition vs backlog not strongly linked")
 
@@ -298,7 +424,7 @@ def _eval_111(dfs):
     t_up,_ = _growth_bool(chro[training], up_thresh=0.05)
     d_up,_ = _growth_bool(coo[defects], up_thresh=0.01)
     # if training up but defects not falling
-    not_helping = (t_up & d_up).sum()
+    not_helping = _count(t_up & d_up)
     if not_helping >= 2: return ("warn", _score("warn"), f"{not_helping} periods: training up but defects up")
     return ("pass", _score("pass"), "Training effect on defects acceptable")
 
@@ -310,7 +436,7 @@ def _eval_112(dfs):
     if not (inv and op): return _na("Columns not found (inventory/operating_cashflow)")
     inv_up,_ = _growth_bool(coo[inv], up_thresh=0.05)
     _, op_down = _growth_bool(cfo[op], down_thresh=-0.05)
-    bad = (inv_up & op_down).sum()
+    bad = _count(inv_up & op_down)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods show inventory rising while op CF falls")
     return ("pass", _score("pass"), "No sustained inventory drag")
 
@@ -321,11 +447,11 @@ def _eval_113(dfs):
     payroll = _find_one(cfo, ["payroll_cost","total_payroll","sga_payroll"])
     revenue = _find_one(cfo, ["revenue","sales","booked_revenue","turnover"])
     if not (head and payroll and revenue): return _na("Columns not found (headcount/payroll/revenue)")
-    H = pd.to_numeric(chro[head], errors="coerce").replace(0, pd.NA).fillna(method="ffill")
-    Rev = pd.to_numeric(cfo[revenue], errors="coerce").fillna(0)
-    RPE = Rev / H.replace(0, pd.NA)
-    rp_down = (_pct_change(RPE) < -0.15).sum()
-    pay_up  = (_pct_change(pd.to_numeric(cfo[payroll], errors="coerce")) > 0.10).sum()
+    H = _numeric(chro, head, None).replace(0, np.nan).ffill()
+    Rev = _numeric(cfo, revenue)
+    RPE = Rev / H  # H has no zeros left; pandas aligns CFO and CHRO rows
+    rp_down = _count(_pct_change(RPE) < -0.15)
+    pay_up  = _count(_pct_change(_numeric(cfo, payroll, None)) > 0.10)
     if rp_down >= 2 and pay_up >= 2: return ("warn", _score("warn"), "Revenue per employee falling while payroll grows")
     return ("pass", _score("pass"), "Headcount, payroll, revenue broadly aligned")
 
@@ -341,7 +467,7 @@ def _eval_114(dfs):
     if not (attr and rec): return _na("Columns not found (attrition/recruitment_spend)")
     a_up,_ = _growth_bool(chro[attr], up_thresh=0.02)
     r_up,_ = _growth_bool((cmo if rec in (cmo.columns if cmo is not None else []) else cpo)[rec], up_thresh=0.10)
-    bad = (a_up & r_up).sum()
+    bad = _count(a_up & r_up)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods: attrition & recruitment spend rising together")
     return ("pass", _score("pass"), "Attrition vs recruitment spend acceptable")
 
@@ -351,11 +477,11 @@ def _eval_115(dfs):
     paid  = _find_one(cmo, ["paid_traffic","paid_sessions","ads_clicks"])
     organic = _find_one(cmo, ["organic_traffic","organic_sessions","seo_sessions"])
     if not (paid and organic): return _na("Columns not found (paid/organic)")
-    ratio = (pd.to_numeric(cmo[paid], errors="coerce").replace(0, pd.NA) /
-             pd.to_numeric(cmo[organic], errors="coerce").replace(0, pd.NA))
+    ratio = (_numeric(cmo, paid, None).replace(0, np.nan) /
+             _numeric(cmo, organic, None).replace(0, np.nan))
     if ratio.isna().all(): return _na("Insufficient numeric data")
-    high = (ratio > 5).sum()
-    volatile = (ratio.pct_change().abs() > 0.5).sum()
+    high = _count(ratio > 5)
+    volatile = _count(ratio.pct_change().abs() > 0.5)
     if high >= 2 or volatile >= 3: return ("warn", _score("warn"), "Paid vs organic looks imbalanced/volatile")
     return ("pass", _score("pass"), "Paid vs organic balance reasonable")
 
@@ -366,11 +492,13 @@ def _eval_116(dfs):
     sql   = _find_one(cmo, ["sql","qualified_leads","sales_qualified_leads"])
     orders = _find_one(coo, ["orders","total_orders","completed_orders","shipments"])
     if not (leads and sql and orders): return _na("Columns not found (leads/sql/orders)")
-    L = pd.to_numeric(cmo[leads], errors="coerce").fillna(0)
-    S = pd.to_numeric(cmo[sql], errors="coerce").fillna(0)
-    O = pd.to_numeric(coo[orders], errors="coerce").fillna(0)
-    viol = ((L + 1e-6) < (S - 1e-6)) | ((S + 1e-6) < (O - 1e-6))
-    v = int(viol.sum()); n = len(viol)
+    L = _numeric(cmo, leads).to_numpy(dtype=np.float64)
+    S = _numeric(cmo, sql).to_numpy(dtype=np.float64)
+    O = _numeric(coo, orders).to_numpy(dtype=np.float64)
+    # one pass of NumPy ufuncs over plain arrays; like the old Series compare,
+    # CMO and COO must have the same number of periods
+    viol = (L + 1e-6 < S - 1e-6) | (S + 1e-6 < O - 1e-6)
+    v = _count(viol); n = viol.size
     if v >= max(2, math.ceil(0.25*n)): return ("fail", _score("fail"), f"Funnel inconsistency in {v}/{n} periods")
     if v > 0: return ("warn", _score("warn"), f"Minor funnel inconsistency in {v}/{n} periods")
     return ("pass", _score("pass"), "Lead→SQL→Order consistent")
@@ -381,11 +509,11 @@ def _eval_117(dfs):
     forecast = _find_one(cfo, ["revenue_forecast","forecast_revenue","proj_revenue"])
     actual   = _find_one(cfo, ["revenue","sales","booked_revenue","turnover"])
     if not (forecast and actual): return _na("Columns not found (forecast/actual revenue)")
-    F = pd.to_numeric(cfo[forecast], errors="coerce").fillna(0)
-    A = pd.to_numeric(cfo[actual], errors="coerce").fillna(0)
+    F = _numeric(cfo, forecast)
+    A = _numeric(cfo, actual)
     err = (F - A).abs()
     tol = (A.abs()*0.15).clip(lower=1.0)  # 15% tolerance
-    bad = (err > tol).sum()
+    bad = _count(err > tol)
     if bad >= max(2, math.ceil(0.3*len(A))): return ("fail", _score("fail"), f"{bad} periods outside tolerance")
     if bad > 0: return ("warn", _score("warn"), f"{bad} periods borderline forecast error")
     return ("pass", _score("pass"), "Forecast vs actual within tolerance")
@@ -397,12 +525,12 @@ def _eval_118(dfs):
     revenue = _find_one(cfo, ["revenue","sales","booked_revenue","turnover"])
     orders = _find_one(coo, ["orders","total_orders","completed_orders","shipments"])
     if not (revenue and orders): return _na("Columns not found (revenue/orders)")
-    Rev = pd.to_numeric(cfo[revenue], errors="coerce").fillna(0)
-    Ord = pd.to_numeric(coo[orders], errors="coerce").replace(0, pd.NA).fillna(method="ffill")
-    price = (Rev / Ord).replace([pd.NA, pd.NaT, float("inf")], pd.NA)
+    Rev = _numeric(cfo, revenue)
+    Ord = _numeric(coo, orders, None).replace(0, np.nan).ffill()
+    price = (Rev / Ord).replace(np.inf, np.nan)
     # If correlation between price proxy and orders is strongly positive, elasticity looks odd
     if price.isna().all() or Ord.isna().all(): return _na("Insufficient data to estimate elasticity")
-    corr = price.corr(Ord)
+    corr = _pearson(price, Ord)
     if pd.isna(corr): return _na("Insufficient overlap to compute correlation")
     if corr > 0.4: return ("warn", _score("warn"), f"Positive price–volume correlation (corr≈{corr:.2f})")
     return ("pass", _score("pass"), f"Elasticity plausible (corr≈{corr:.2f})")
@@ -413,9 +541,9 @@ def _eval_119(dfs):
     backlog = _find_one(coo, ["backlog","order_backlog","pending_orders","open_orders"])
     complaints = _find_one(coo, ["complaints","customer_complaints","tickets"])
     if not (backlog and complaints): return _na("Columns not found (backlog/complaints)")
-    B = pd.to_numeric(coo[backlog], errors="coerce").fillna(0)
-    C = pd.to_numeric(coo[complaints], errors="coerce").fillna(0)
-    corr = B.corr(C)
+    B = _numeric(coo, backlog)
+    C = _numeric(coo, complaints)
+    corr = _pearson(B, C)
     if pd.isna(corr): return _na("Insufficient overlap to compute correlation")
     if corr < 0.0: return ("warn", _score("warn"), f"Backlog↑ with complaints↓ (corr≈{corr:.2f}) – data check?")
     return ("pass", _score("pass"), f"Complaints move with backlog (corr≈{corr:.2f})")
@@ -428,7 +556,7 @@ def _eval_120(dfs):
     if not (maint and defects): return _na("Columns not found (maintenance_spend/defects)")
     m_up,_ = _growth_bool(coo[maint], up_thresh=0.05)
     d_up,_ = _growth_bool(coo[defects], up_thresh=0.01)
-    bad = (m_up & d_up).sum()
+    bad = _count(m_up & d_up)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods: maintenance spend up but defects up")
     return ("pass", _score("pass"), "Maintenance spend aligns with defect trend")
 
@@ -439,11 +567,11 @@ def _eval_121(dfs):
     hires = _find_one(cpo, ["new_hires","hiring","offers_accepted","joined"])
     revenue = _find_one(cfo, ["revenue","sales","booked_revenue","turnover"])
     if not (head and hires and revenue): return _na("Columns not found (headcount/hires/revenue)")
-    H = pd.to_numeric(chro[head], errors="coerce").replace(0, pd.NA).fillna(method="ffill")
-    Rev = pd.to_numeric(cfo[revenue], errors="coerce").fillna(0)
-    RPE = Rev / H.replace(0, pd.NA)
-    rpe_down = (_pct_change(RPE) < -0.15).sum()
-    h_up,_ = _growth_bool(pd.to_numeric(cpo[hires], errors="coerce"), up_thresh=0.1)
+    H = _numeric(chro, head, None).replace(0, np.nan).ffill()
+    Rev = _numeric(cfo, revenue)
+    RPE = Rev / H  # H has no zeros left; pandas aligns CFO and CHRO rows
+    rpe_down = _count(_pct_change(RPE) < -0.15)
+    h_up,_ = _growth_bool(_numeric(cpo, hires, None), up_thresh=0.1)
     if rpe_down >= 2 and h_up >= 2: return ("warn", _score("warn"), "Revenue/employee falling while hiring velocity increases")
     return ("pass", _score("pass"), "Revenue/employee vs hiring velocity acceptable")
 
@@ -453,12 +581,12 @@ def _eval_122(dfs):
     ltv = _find_one(cmo, ["ltv","customer_ltv","avg_ltv"])
     cac = _find_one(cmo, ["cac","customer_acquisition_cost"])
     if not (ltv and cac): return _na("Columns not found (ltv/cac)")
-    L = pd.to_numeric(cmo[ltv], errors="coerce").replace([0, pd.NA], pd.NA)
-    C = pd.to_numeric(cmo[cac], errors="coerce").replace([0, pd.NA], pd.NA)
+    L = _numeric(cmo, ltv, None).replace(0, np.nan)
+    C = _numeric(cmo, cac, None).replace(0, np.nan)
     ratio = (L / C).dropna()
     if ratio.empty: return _na("Insufficient LTV or CAC data")
-    low = (ratio < 1).sum()
-    extreme = (ratio > 10).sum()
+    low = _count(ratio < 1)
+    extreme = _count(ratio > 10)
     if low >= 2: return ("fail", _score("fail"), f"{low} periods LTV:CAC < 1")
     if extreme >= 2: return ("warn", _score("warn"), f"{extreme} periods LTV:CAC unusually high")
     return ("pass", _score("pass"), "LTV:CAC within reasonable bounds")
@@ -472,7 +600,7 @@ def _eval_123(dfs):
     if not (spend and leads and conv): return _na("Columns not found (spend/leads/conversion)")
     s_up,_ = _growth_bool(cmo[spend])
     _, q_down = _growth_bool(cmo[conv], down_thresh=-0.05)
-    bad = (s_up & q_down).sum()
+    bad = _count(s_up & q_down)
     if bad >= 2: return ("warn", _score("warn"), f"{bad} periods: spend↑ while lead quality/conv↓")
     return ("pass", _score("pass"), "Spend vs lead quality stable")
 
@@ -485,7 +613,7 @@ def _eval_124(dfs):
     ot_up,_ = _growth_bool(coo[overtime], up_thresh=0.05)
     _, breaches_down = _growth_bool(coo[sla_breach], down_thresh=-0.05)
     # If overtime rises but breaches don't fall, it’s a miss
-    miss = (ot_up & (~breaches_down)).sum()
+    miss = _count(ot_up & (~breaches_down))
     if miss >= 2: return ("warn", _score("warn"), f"{miss} periods: overtime↑ without SLA improvement")
     return ("pass", _score("pass"), "Overtime seems to help SLA outcomes")
 
@@ -496,18 +624,23 @@ def _eval_125(dfs):
     spend  = _find_one(cmo, ["marketing_spend","ad_spend","total_spend","spend"])
     hires  = _find_one(cpo, ["new_hires","hiring","offers_accepted","joined"])
     if not (runway and spend and hires): return _na("Columns not found (runway/spend/hiring)")
-    R = pd.to_numeric(cfo[runway], errors="coerce").fillna(0)
-    S = pd.to_numeric(cmo[spend], errors="coerce").fillna(0)
-    H = pd.to_numeric(cpo[hires], errors="coerce").fillna(0)
-    low_runway = (R < 6).sum()
+    R = _numeric(cfo, runway)
+    S = _numeric(cmo, spend)
+    H = _numeric(cpo, hires)
+    low_runway = _count(R < 6)
     s_up,_ = _growth_bool(S)
     h_up,_ = _growth_bool(H)
-    if low_runway >= 2 and s_up.sum() >= 2 and h_up.sum() >= 2:
+    if low_runway >= 2 and _count(s_up) >= 2 and _count(h_up) >= 2:
         return ("fail", _score("fail"), "Low runway while spend & hiring rise across multiple periods")
-    if (R < 6).sum() >= 1 and (s_up.sum() >= 1 or h_up.sum() >= 1):
+    if _count(R < 6) >= 1 and (_count(s_up) >= 1 or _count(h_up) >= 1):
         return ("warn", _score("warn"), "Runway tight with rising spend/hiring")
     return ("pass", _score("pass"), "Runway vs spend & hiring looks reasonable")
 
+RULE_POOL = ThreadPoolExecutor(
+    max_workers=min(8, os.cpu_count() or 2),
+    thread_name_prefix="cross-rule",
+)
+
 # Map rule_id -> evaluator
 EVALS: Dict[str, Callable[[Dict[str, pd.DataFrame]], Tuple[str, float, str]]] = {
     "CROSS-R-101": _eval_101,
@@ -537,40 +670,112 @@ EVALS: Dict[str, Callable[[Dict[str, pd.DataFrame]], Tuple[str, float, str]]] =
     "CROSS-R-125": _eval_125,
 }
 
+# ---------------------------------------------
+# Result cache
+# ---------------------------------------------
+# (rules signature, brain data signature) -> findings. Repeat runs over the
+# same uploaded brains (dashboard refreshes) skip all 25 evaluators.
+_RESULT_CACHE: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+_RESULT_CACHE_MAX = 32
+_RESULT_CACHE_LOCK = threading.Lock()  # concurrent API requests share the cache
+
+def _rules_sig(rules: List[Rule]) -> Tuple:
+    return tuple((r.rule_id, r.file_path, os.path.getmtime(r.file_path)) for r in rules)
+
+def _dfs_sig(brain_inputs: Dict[str, pd.DataFrame]) -> Optional[Tuple]:
+    """Content signature of the brain frames, or None if one can't be hashed."""
+    sig = []
+    for k in sorted(brain_inputs):
+        df = brain_inputs[k]
+        if not isinstance(df, pd.DataFrame):
+            sig.append((k, None))
+            continue
+        try:
+            # row hashes digested in order: the same rows reordered are a
+            # different series, and so a different key
+            rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        except Exception:
+            return None  # unhashable cells (lists, dicts): don't cache
+        h = hashlib.blake2b(rows.tobytes(), digest_size=16).hexdigest()
+        sig.append((k, df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), h))
+    return tuple(sig)
+
+def _run_rule(r: Rule, views: RunViews) -> Dict[str, Any]:
+    with _in_run(views):
+        return _run_rule_in(r, views)
+
+def _run_rule_in(r: Rule, views: RunViews) -> Dict[str, Any]:
+    try:
+        fn = EVALS.get(r.rule_id)
+        if fn is None:
+            status, score, detail = _na("No native evaluator for this rule_id")
+        else:
+            status, score, detail = fn(views)
+        return {
+            "rule_id": r.rule_id,
+            "title": r.title,
+            "severity": r.severity,
+            "status": status,
+            "score": score,
+            "_file": r.file_path,
+            "detail": detail,
+        }
+    except Exception as e:
+        return {
+            "rule_id": r.rule_id,
+            "title": r.title,
+            "severity": r.severity,
+            "status": "error",
+            "score": 0.0,
+            "_file": r.file_path,
+            "detail": f"{type(e).__name__}: {e}",
+            "trace": traceback.format_exc(limit=2),
+        }
+
+def _evaluate(rules: List[Rule], brain_inputs: Dict[str, pd.DataFrame]) -> List[Dict[str, Any]]:
+    # Each brain is put in period order once, re-indexed 0..n-1 so rows
+    # line up by position across brains, and indexed for column lookup;
+    # every rule of this run shares the result through `views`.
+    views = RunViews()
+    with _in_run(views):
+        for k, df in brain_inputs.items():
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                ordered = _sort_by_period(df)
+                if ordered is not df:
+                    ordered = ordered.reset_index(drop=True)
+                views[k] = _brain_view(ordered)
+    # Rules are independent reads of the shared views and their numeric
+    # work runs in pandas/NumPy C code, so they fan out over threads;
+    # map() keeps findings in rule order.
+    return list(RULE_POOL.map(lambda r: _run_rule(r, views), rules))
+
 # ---------------------------------------------
 # Public API
 # ---------------------------------------------
 def evaluate_cross_rules(brain_inputs: Dict[str, pd.DataFrame], rules_dir: str) -> Dict[str, Any]:
     rules_dir = os.path.normpath(rules_dir)
     rules = _load_rules(rules_dir)
-    findings: List[Dict[str, Any]] = []
-    for r in rules:
-        try:
-            fn = EVALS.get(r.rule_id)
-            if fn is None:
-                status, score, detail = _na("No native evaluator for this rule_id")
-            else:
-                status, score, detail = fn(brain_inputs)
-            findings.append({
-                "rule_id": r.rule_id,
-                "title": r.title,
-                "severity": r.severity,
-                "status": status,
-                "score": score,
-                "_file": r.file_path,
-                "detail": detail,
-            })
-        except Exception as e:
-            findings.append({
-                "rule_id": r.rule_id,
-                "title": r.title,
-                "severity": r.severity,
-                "status": "error",
-                "score": 0.0,
-                "_file": r.file_path,
-                "detail": f"{type(e).__name__}: {e}",
-                "trace": traceback.format_exc(limit=2),
-            })
+
+    dfs_sig = _dfs_sig(brain_inputs)
+    key = (_rules_sig(rules), dfs_sig) if dfs_sig is not None else None
+    cached = None
+    if key is not None:
+        with _RESULT_CACHE_LOCK:
+            cached = _RESULT_CACHE.get(key)
+            if cached is not None:
+                _RESULT_CACHE.move_to_end(key)
+    if cached is not None:
+        findings = [dict(f) for f in cached]  # callers may annotate findings
+    else:
+        findings = _evaluate(rules, brain_inputs)
+        if key is not None:
+            entry = [dict(f) for f in findings]
+            with _RESULT_CACHE_LOCK:
+                _RESULT_CACHE[key] = entry
+                _RESULT_CACHE.move_to_end(key)
+                while len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+                    _RESULT_CACHE.popitem(last=False)
+
     meta = {
         "engine": "native",
         "rules_path": rules_dir,
@@ -0,0 +1,89 @@
+# rate_limit.py
+# -*- coding: utf-8 -*-
+"""
+Redis-backed rate limiting for the expensive SLM endpoints.
+
+Active only when REDIS_URL is set and fastapi-limiter is installed;
+otherwise `rate_limit()` returns no dependencies and endpoints run
+unthrottled (local dev).
+
+Callers are keyed by the user of a valid bearer token (see
+routes_bos_auth), else by client IP. Nothing in the request body is
+trusted: the per-minute cap is scaled by the `rate_limit_multiplier` of
+the user's tier as stored server-side (users.tier); anonymous callers get
+the demo cap. Behind a proxy, run uvicorn with --proxy-headers and
+--forwarded-allow-ips so request.client is the real client.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+from fastapi import Depends, Request, Response
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+
+from bos_credits import lookup_plan_tier
+from routes_bos_auth import JWT_ALG, JWT_SECRET
+from tier_config import get_tier_config
+
+try:
+    import redis.asyncio as aioredis
+    from fastapi_limiter import FastAPILimiter
+    from fastapi_limiter.depends import RateLimiter
+except Exception:
+    aioredis = None
+    FastAPILimiter = None
+    RateLimiter = None
+
+REDIS_URL = os.getenv("REDIS_URL")
+ENABLED = bool(REDIS_URL) and FastAPILimiter is not None
+
+
+def _token_user_id(request: Request) -> Optional[int]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return int(jwt.decode(token.strip(), JWT_SECRET, algorithms=[JWT_ALG])["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+
+async def identify(request: Request) -> str:
+    user_id = _token_user_id(request)
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def init_rate_limiter() -> None:
+    if ENABLED:
+        conn = aioredis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+        await FastAPILimiter.init(conn, identifier=identify)
+
+
+async def close_rate_limiter() -> None:
+    if ENABLED and hasattr(FastAPILimiter, "close"):
+        await FastAPILimiter.close()
+
+
+def rate_limit(times: int, minutes: int = 1) -> List:
+    """
+    Route dependencies allowing `times` calls per `minutes` for a demo-tier
+    caller (scaled up for paid tiers). Use as `dependencies=rate_limit(5)`.
+    """
+    if not ENABLED:
+        return []
+
+    limiters: Dict[int, "RateLimiter"] = {}
+
+    async def _limit(request: Request, response: Response) -> None:
+        user_id = _token_user_id(request)
+        tier = await run_in_threadpool(lookup_plan_tier, user_id) if user_id is not None else "demo"
+        cap = times * int(get_tier_config(str(tier)).get("rate_limit_multiplier", 1))
+        limiter = limiters.get(cap)
+        if limiter is None:
+            limiter = limiters[cap] = RateLimiter(times=cap, minutes=minutes, identifier=identify)
+        await limiter(request, response)
+
+    return [Depends(_limit)]
@@ -648,6 +648,7 @@ def run(
     - fusion mode otherwise
     - 2-pass generation: initial -> repair (if empty/invalid) -> deterministic fallback
     - Always attaches _meta and charts
+    - Always returns a dict (model output is parsed here, never by callers)
     """
     per_brain_norm = _normalize_per_brain(per_brain)
 
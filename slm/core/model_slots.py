@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Per-model concurrency cap for Ollama calls.
+
+This does no batching: Ollama's /api/generate takes one prompt per request,
+and Ollama batches concurrent requests for the same model itself
+(OLLAMA_NUM_PARALLEL). Calls go straight through while the model has a free
+slot; extra calls queue here (bounded by the caller's deadline) instead of
+piling up inside Ollama.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+MODEL_PARALLEL = int(os.getenv("SLM_MODEL_PARALLEL", os.getenv("OLLAMA_NUM_PARALLEL", "8")))
+
+_slots: Dict[Tuple[str, str], threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+class SlotTimeout(TimeoutError):
+    """No slot for the model freed up before the caller's deadline."""
+
+
+def _slot(host: str, model: str) -> threading.BoundedSemaphore:
+    key = (host, model)
+    sem = _slots.get(key)
+    if sem is None:
+        with _slots_lock:
+            sem = _slots.setdefault(key, threading.BoundedSemaphore(max(1, MODEL_PARALLEL)))
+    return sem
+
+
+@contextmanager
+def model_slot(host: str, model: str, timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    Hold one of the model's MODEL_PARALLEL slots for the duration of the call.
+    Waits at most `timeout` seconds for a slot, then raises SlotTimeout.
+    """
+    sem = _slot(host, model)
+    if not sem.acquire(timeout=timeout):
+        raise SlotTimeout(f"no free Ollama slot for {model} within {timeout}s")
+    try:
+        yield
+    finally:
+        sem.release()
@@ -2,17 +2,24 @@
 from __future__ import annotations
 
 import json
+import os
 import re
+import time
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from slm.core.model_slots import SlotTimeout, model_slot
 
 __all__ = [
     "OllamaRunner",
     "run_brain",
     "build_brain_prompt",
     "call_ollama",
+    "close_session",
+    "warm_model",
     "PROMPT_SYSTEM",
 ]
 
@@ -21,6 +28,34 @@ PROMPT_SYSTEM = (
     "Respond ONLY with strict JSON that matches the requested schema. "
     "Do not include code fences or extra commentary."
 )
+
+# -----------------------------
+# Shared HTTP session
+# -----------------------------
+# One keep-alive pool for every runner in the process, so brain/EA calls
+# reuse TCP connections to Ollama instead of reconnecting per request.
+_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "32"))
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=_POOL_SIZE))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=_POOL_SIZE))
+
+
+def close_session() -> None:
+    """Close pooled Ollama connections (call on app shutdown)."""
+    _SESSION.close()
+
+
+def warm_model(host: str, model: str, timeout_sec: int = 120) -> bool:
+    """
+    Ask Ollama to load `model` into memory (a generate call with no prompt),
+    so the first real request does not pay the weight load. Never raises.
+    """
+    try:
+        r = _SESSION.post(f"{host}/api/generate", json={"model": model}, timeout=timeout_sec)
+        return r.ok
+    except requests.RequestException:
+        return False
+
 # -----------------------------
 # Low-level Ollama HTTP runner
 # -----------------------------
@@ -68,8 +103,15 @@ class OllamaRunner:
         }
     
         try:
-            r = requests.post(url, json=payload, timeout=self.timeout_sec)
+            # Waits for a free slot of the model (see model_slots); the
+            # wait counts against timeout_sec like the HTTP call itself
+            t0 = time.monotonic()
+            with model_slot(self.host, self.model, timeout=self.timeout_sec):
+                left = max(1.0, self.timeout_sec - (time.monotonic() - t0))
+                r = _SESSION.post(url, json=payload, timeout=left)
             r.raise_for_status()
+        except SlotTimeout:
+            raise RuntimeError(f"[SLM] No free Ollama slot for '{self.model}' within {self.timeout_sec}s.")
         except requests.exceptions.ReadTimeout:
             raise RuntimeError(f"[SLM] Ollama timed out after {self.timeout_sec}s.")
         except requests.exceptions.ConnectionError as e:
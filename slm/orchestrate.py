@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+In-process EA orchestration: the five CXO brains run in parallel on a
+shared thread pool, then the EA pass aggregates them.
+
+Identical (packet, settings) requests share one in-flight fan-out, and
+finished bundles are reused for a short TTL (UI retries / double-clicks,
+re-uploads of the same document). With diskcache installed the TTL cache is
+also shared by every worker process on the box.
+
+Cached bundles are shared, so callers get a deep copy they are free to
+mutate (upload-and-ea appends warnings / extract_meta to `ui`).
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+
+try:
+    import diskcache  # optional: finished bundles shared across workers
+except Exception:
+    diskcache = None
+
+from .brains import ea_slm
+from .config import get_brain_effective
+from .run_slm import _call_brain, _finalize
+
+BRAINS = ["cfo", "cmo", "coo", "chro", "cpo"]
+
+# One pool for the whole process; sized for EA_CONCURRENCY overlapping EA runs
+BRAIN_POOL = ThreadPoolExecutor(
+    max_workers=len(BRAINS) * int(os.getenv("EA_CONCURRENCY", "4")),
+    thread_name_prefix="brain",
+)
+
+_INFLIGHT: Dict[str, asyncio.Future] = {}
+RESULT_TTL = int(os.getenv("SLM_RESULT_TTL", "60"))
+_RESULT_CACHE: TTLCache = TTLCache(maxsize=256, ttl=RESULT_TTL)
+
+_RESULT_DISK = None
+if diskcache is not None:
+    try:
+        _RESULT_DISK = diskcache.Cache(os.getenv("SLM_CACHE_DIR", "/tmp/caio-slm"))
+    except Exception:
+        _RESULT_DISK = None
+# id(cfg) -> (cfg, defaults); cfg is held so its id is never reused
+_DEFAULT_EFFS: Dict[int, Any] = {}
+
+
+def shutdown() -> None:
+    BRAIN_POOL.shutdown(wait=True)
+    if _RESULT_DISK is not None:
+        _RESULT_DISK.close()
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    hit = _RESULT_CACHE.get(key)
+    if hit is None and _RESULT_DISK is not None:
+        try:
+            hit = _RESULT_DISK.get(key)
+        except Exception:
+            hit = None
+        if hit is not None:
+            _RESULT_CACHE[key] = hit
+    return hit
+
+
+def _cache_put(key: str, bundle: Dict[str, Any]) -> None:
+    _RESULT_CACHE[key] = bundle
+    if _RESULT_DISK is not None:
+        try:
+            _RESULT_DISK.set(key, bundle, expire=RESULT_TTL)
+        except Exception:
+            pass
+
+
+def effective_settings(
+    cfg,
+    *,
+    model: Optional[str] = None,
+    timeout_sec: Optional[int] = None,
+    num_predict: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Effective settings for every brain + EA, merged once per request."""
+    if not (model or timeout_sec or num_predict):
+        hit = _DEFAULT_EFFS.get(id(cfg))
+        if hit is None:
+            # callers must treat the cached dicts as read-only
+            hit = _DEFAULT_EFFS[id(cfg)] = (cfg, {b: get_brain_effective(cfg, b) for b in BRAINS + ["ea"]})
+        return hit[1]
+
+    effs = {}
+    for b in BRAINS + ["ea"]:
+        e = get_brain_effective(cfg, b)
+        if model:       e["model"] = model
+        if timeout_sec: e["timeout_sec"] = int(timeout_sec)
+        if num_predict: e["num_predict"] = int(num_predict)
+        effs[b] = e
+    return effs
+
+
+def _run_brain(name: str, pkt: Dict[str, Any], eff: Dict[str, Any]) -> Dict[str, Any]:
+    return _finalize(_call_brain(name, pkt, eff), eff)
+
+
+def _settings_key(pkt: Dict[str, Any], model, timeout_sec, num_predict, ea_min_predict) -> str:
+    return _request_key(pkt, {
+        "model": model, "timeout_sec": timeout_sec,
+        "num_predict": num_predict, "ea_min_predict": ea_min_predict,
+    })
+
+
+def _request_key(pkt: Dict[str, Any], settings: Dict[str, Any]) -> str:
+    blob = orjson.dumps(
+        {"packet": pkt, "settings": settings},
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str,
+    )
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+async def _iter_ea(
+    pkt: Dict[str, Any],
+    effs: Dict[str, Dict[str, Any]],
+    ea_min_predict: int,
+) -> AsyncIterator[Tuple[str, Optional[str], Dict[str, Any]]]:
+    """
+    Yield ("brain", name, result) as each CXO pass finishes, then
+    ("ea", None, bundle) once the EA aggregation is done.
+    """
+    t0 = time.time()
+    loop = asyncio.get_running_loop()
+
+    # parallel CXO passes
+    futs = {loop.run_in_executor(BRAIN_POOL, _run_brain, b, pkt, effs[b]): b for b in BRAINS}
+    per_brain: Dict[str, Any] = {}
+    pending = set(futs)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for f in done:
+            b = futs[f]
+            per_brain[b] = f.result()
+            yield "brain", b, per_brain[b]
+    per_brain = {b: per_brain[b] for b in BRAINS}
+
+    # EA aggregation
+    ea_eff = effs["ea"]
+    ea_json = await loop.run_in_executor(BRAIN_POOL, partial(
+        ea_slm.run,
+        pkt, per_brain=per_brain,
+        host=ea_eff["host"], model=ea_eff["model"],
+        timeout_sec=ea_eff["timeout_sec"],
+        num_predict=max(int(ea_eff["num_predict"]), ea_min_predict),
+        temperature=ea_eff["temperature"], top_p=ea_eff["top_p"],
+        repeat_penalty=ea_eff["repeat_penalty"],
+    ))
+
+    # ea_slm.run always returns a dict; guard only against a contract break
+    if not isinstance(ea_json, dict):
+        ea_json = {"executive_summary": str(ea_json or "EA returned no content.")}
+
+    ea_json = _finalize(ea_json, ea_eff)
+    ea_json.setdefault("cross_brain_actions_7d", [])
+    ea_json.setdefault("cross_brain_actions_30d", [])
+    ea_json.setdefault("top_priorities", [])
+    ea_json.setdefault("key_risks", [])
+    ea_json.setdefault("owner_matrix", {})
+    ea_json["_meta"]["elapsed_sec"] = round(time.time() - t0, 2)
+
+    yield "ea", None, {"ui": ea_json, "per_brain": per_brain}
+
+
+async def _run_ea_bundle(
+    pkt: Dict[str, Any],
+    effs: Dict[str, Dict[str, Any]],
+    ea_min_predict: int,
+) -> Dict[str, Any]:
+    async for event, _, data in _iter_ea(pkt, effs, ea_min_predict):
+        if event == "ea":
+            return data
+    raise RuntimeError("EA fan-out finished without a result")
+
+
+async def run_ea_inproc(
+    pkt: Dict[str, Any],
+    *,
+    cfg,
+    model: Optional[str] = None,
+    timeout_sec: Optional[int] = None,
+    num_predict: Optional[int] = None,
+    ea_min_predict: int = 256,
+) -> Dict[str, Any]:
+    """
+    Run all brains + EA for `pkt` and return the `{"ui", "per_brain"}` bundle.
+    Exceptions propagate; they are never cached.
+    """
+    key = _settings_key(pkt, model, timeout_sec, num_predict, ea_min_predict)
+    cached = _cache_get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+    inflight = _INFLIGHT.get(key)
+    if inflight is not None:
+        # the leader's bundle is shared by every waiter; each gets its own copy
+        return copy.deepcopy(await asyncio.shield(inflight))
+
+    fut = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = fut
+    try:
+        effs = effective_settings(cfg, model=model, timeout_sec=timeout_sec, num_predict=num_predict)
+        bundle = await _run_ea_bundle(pkt, effs, ea_min_predict)
+    except BaseException as e:
+        # a cancelled leader (deadline, disconnect) fails its waiters with an
+        # ordinary error instead of cancelling their requests
+        fut.set_exception(e if isinstance(e, Exception) else RuntimeError("EA run was cancelled"))
+        fut.exception()  # mark retrieved; waiters still see it
+        raise
+    finally:
+        _INFLIGHT.pop(key, None)
+
+    _cache_put(key, bundle)
+    fut.set_result(bundle)
+    return copy.deepcopy(bundle)
+
+
+async def stream_ea_inproc(
+    pkt: Dict[str, Any],
+    *,
+    cfg,
+    model: Optional[str] = None,
+    timeout_sec: Optional[int] = None,
+    num_predict: Optional[int] = None,
+    ea_min_predict: int = 256,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming form of run_ea_inproc(): yields ("brain", {"brain", "result"})
+    per finished CXO pass, then ("ea", bundle). Cached bundles replay at once.
+    """
+    key = _settings_key(pkt, model, timeout_sec, num_predict, ea_min_predict)
+    bundle = _cache_get(key)
+    if bundle is None:
+        effs = effective_settings(cfg, model=model, timeout_sec=timeout_sec, num_predict=num_predict)
+        async for event, b, data in _iter_ea(pkt, effs, ea_min_predict):
+            if event == "brain":
+                yield "brain", {"brain": b, "result": data}
+            else:
+                bundle = data
+        _cache_put(key, bundle)
+        bundle = copy.deepcopy(bundle)
+    else:
+        bundle = copy.deepcopy(bundle)
+        for b, res in bundle["per_brain"].items():
+            yield "brain", {"brain": b, "result": res}
+    yield "ea", bundle
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 import argparse, json, sys, os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+try:
+    import orjson  # packet/result (de)serialization; large document_text strings
+except Exception:
+    orjson = None
 
 # ---------------------------------------------------------------------
 # Package-safe imports: works both as module and direct script
@@ -22,15 +27,29 @@ else:
 DEFAULT_CONFIG_PATH = "slm/config/models.yaml"
 
 def _print_json(obj: Any):
+    if orjson is not None:
+        try:
+            blob = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            blob = None
+        if blob is not None:
+            # [SLM] log lines go through the text layer; flush them first
+            sys.stdout.flush()
+            sys.stdout.buffer.write(blob + b"\n")
+            sys.stdout.buffer.flush()
+            return
     print(json.dumps(obj, indent=2, ensure_ascii=False))
 
 def _read_json(fp: Path):
-    with fp.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    # "-" means the packet is piped on stdin (no temp file handoff)
+    raw = sys.stdin.buffer.read() if str(fp) == "-" else fp.read_bytes()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 def _to_jsonable(x):
-    if hasattr(x, "model_dump_json"):  # pydantic v2
-        return json.loads(x.model_dump_json())
+    if hasattr(x, "model_dump"):       # pydantic v2: JSON-safe dict in one pass
+        return x.model_dump(mode="json")
     if hasattr(x, "dict"):             # pydantic v1
         return x.dict()
     if hasattr(x, "__dict__"):
@@ -50,15 +69,20 @@ def _ensure_meta(obj: Dict[str, Any], eff: Dict[str, Any]) -> Dict[str, Any]:
         meta.setdefault("confidence", 0.0)
     return obj
 
+def _finalize(out: Any, eff: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a brain/EA result to a JSON-safe dict and attach `_meta`."""
+    return _ensure_meta(_to_jsonable(out), eff)
+
+_BRAIN_FNS = {
+    "cfo": cfo_slm.run,
+    "cmo": cmo_slm.run,
+    "coo": coo_slm.run,
+    "chro": chro_slm.run,
+    "cpo": cpo_slm.run,
+}
+
 def _call_brain(name: str, pkt: dict, eff: dict):
-    fn_map = {
-        "cfo": cfo_slm.run,
-        "cmo": cmo_slm.run,
-        "coo": coo_slm.run,
-        "chro": chro_slm.run,
-        "cpo": cpo_slm.run,
-    }
-    fn = fn_map[name]
+    fn = _BRAIN_FNS[name]
     out = fn(
         pkt,
         host=eff["host"],
@@ -69,11 +93,106 @@ def _call_brain(name: str, pkt: dict, eff: dict):
         top_p=eff["top_p"],
         repeat_penalty=eff["repeat_penalty"],
     )
-    return _to_jsonable(out)
+    return out
+
+def run(
+    pkt: Dict[str, Any],
+    brain: str,
+    *,
+    cfg=None,
+    config_path: str = DEFAULT_CONFIG_PATH,
+    model: Optional[str] = None,
+    timeout_sec: Optional[int] = None,
+    num_predict: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    In-process entrypoint behind `python -m slm.run_slm`.
+    Returns the same dict the CLI prints. Pass a preloaded `cfg` to skip
+    re-reading models.yaml on every call.
+    """
+    if cfg is None:
+        cfg = load_config(config_path)
+
+    def eff_for(brain_name: str) -> dict:
+        e = get_brain_effective(cfg, brain_name)
+        if model:       e["model"] = model
+        if timeout_sec: e["timeout_sec"] = int(timeout_sec)
+        if num_predict: e["num_predict"] = int(num_predict)
+        return e
+
+    # Single brain
+    if brain in {"cfo", "cmo", "coo", "chro", "cpo"}:
+        e = eff_for(brain)
+        return _finalize(_call_brain(brain, pkt, e), e)
+
+    # All brains
+    if brain == "all":
+        results = {}
+        for b in ["cfo", "cmo", "coo", "chro", "cpo"]:
+            e = eff_for(b)
+            results[b] = _finalize(_call_brain(b, pkt, e), e)
+        return results
+
+    # Executive Assistant aggregator (parallelize per-brain runs)
+    if brain == "ea":
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        brain_list = ["cfo", "cmo", "coo", "chro", "cpo"]
+
+        def run_one(brain_name: str):
+            e = eff_for(brain_name)
+            out = _finalize(_call_brain(brain_name, pkt, e), e)
+            return brain_name, out
+
+        per_brain = {}
+        max_workers = min(len(brain_list), max(2, (os.cpu_count() or 4)))
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = {ex.submit(run_one, b): b for b in brain_list}
+            for fut in as_completed(futures):
+                b, out = fut.result()
+                per_brain[b] = out
+
+        ea_e = eff_for("ea")
+        ea_json = ea_slm.run(
+            pkt,
+            per_brain=per_brain,
+            host=ea_e["host"],
+            model=ea_e["model"],
+            timeout_sec=ea_e["timeout_sec"],
+            num_predict=max(int(ea_e["num_predict"]), 256),
+            temperature=ea_e["temperature"],
+            top_p=ea_e["top_p"],
+            repeat_penalty=ea_e["repeat_penalty"],
+        )
+
+        # ea_slm.run always returns a dict; guard only against a contract break
+        if not isinstance(ea_json, dict):
+            ea_json = {"executive_summary": str(ea_json or "EA returned no content.")}
+
+        return _finalize(ea_json, ea_e)
+
+    raise ValueError(f"[SLM] Unknown brain '{brain}'")
+
+# ---------------------------------------------------------------------
+# Process-pool workers (API isolation mode): config is loaded once per
+# worker process, then every run reuses it.
+# ---------------------------------------------------------------------
+_WORKER_CFG = None
+
+def worker_init(config_path: str = DEFAULT_CONFIG_PATH) -> None:
+    global _WORKER_CFG
+    _WORKER_CFG = load_config(config_path)
+
+def worker_run(pkt: Dict[str, Any], brain: str, **kwargs) -> Dict[str, Any]:
+    return run(pkt, brain, cfg=_WORKER_CFG, **kwargs)
+
+def worker_ready() -> bool:
+    """No-op task: submitting one per worker at startup spawns and initializes them."""
+    return _WORKER_CFG is not None
 
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument("--input", required=True, help="Phase 2.5 packet (e.g., bad_with_insights.json)")
+    p.add_argument("--input", required=True, help="Phase 2.5 packet (e.g., bad_with_insights.json), or '-' for stdin")
     p.add_argument("--brain", required=True, choices=["cfo", "cmo", "coo", "chro", "cpo", "all", "ea"])
     p.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="Path to models.yaml")
     p.add_argument("--model", default=None)
@@ -82,82 +201,17 @@ def main():
     args = p.parse_args()
 
     try:
-        cfg = load_config(args.config)
         pkt = _read_json(Path(args.input))
-
-        def eff_for(brain: str) -> dict:
-            e = get_brain_effective(cfg, brain)
-            if args.model:       e["model"] = args.model
-            if args.timeout:     e["timeout_sec"] = int(args.timeout)
-            if args.num_predict: e["num_predict"] = int(args.num_predict)
-            return e
-
-        # Single brain
-        if args.brain in {"cfo", "cmo", "coo", "chro", "cpo"}:
-            e = eff_for(args.brain)
-            out = _ensure_meta(_call_brain(args.brain, pkt, e), e)
-            _print_json(out)
-            return
-
-        # All brains
-        if args.brain == "all":
-            results = {}
-            for b in ["cfo", "cmo", "coo", "chro", "cpo"]:
-                e = eff_for(b)
-                results[b] = _ensure_meta(_call_brain(b, pkt, e), e)
-            _print_json(results)
-            return
-
-        # Executive Assistant aggregator (parallelize per-brain runs)
-        if args.brain == "ea":
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-
-            brain_list = ["cfo", "cmo", "coo", "chro", "cpo"]
-
-            def run_one(brain_name: str):
-                e = eff_for(brain_name)
-                out = _ensure_meta(_call_brain(brain_name, pkt, e), e)
-                return brain_name, out
-
-            per_brain = {}
-            max_workers = min(len(brain_list), max(2, (os.cpu_count() or 4)))
-            with ThreadPoolExecutor(max_workers=max_workers) as ex:
-                futures = {ex.submit(run_one, b): b for b in brain_list}
-                for fut in as_completed(futures):
-                    b, out = fut.result()
-                    per_brain[b] = out
-
-            ea_e = eff_for("ea")
-            ea_json = ea_slm.run(
-                pkt,
-                per_brain=per_brain,
-                host=ea_e["host"],
-                model=ea_e["model"],
-                timeout_sec=ea_e["timeout_sec"],
-                num_predict=max(int(ea_e["num_predict"]), 256),
-                temperature=ea_e["temperature"],
-                top_p=ea_e["top_p"],
-                repeat_penalty=ea_e["repeat_penalty"],
-            )
-
-            # normalize to dict
-            if ea_json is None:
-                ea_json = {"executive_summary": "EA returned no content."}
-            elif isinstance(ea_json, str):
-                msg = ea_json.strip()
-                if msg:
-                    try:
-                        ea_json = json.loads(msg)
-                    except Exception:
-                        ea_json = {"executive_summary": msg}
-                else:
-                    ea_json = {"executive_summary": "EA returned empty output."}
-            elif not isinstance(ea_json, dict):
-                ea_json = {"executive_summary": str(ea_json)}
-
-            ea_json = _ensure_meta(_to_jsonable(ea_json), ea_e)
-            _print_json(ea_json)
-            return
+        out = run(
+            pkt,
+            args.brain,
+            config_path=args.config,
+            model=args.model,
+            timeout_sec=args.timeout,
+            num_predict=args.num_predict,
+        )
+        _print_json(out)
+        return
 
     except Exception as e:
         # Always emit JSON so the UI can show it in the EA Summary box
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from cross_rules_engine import _growth_bool, _pct_change
+
+
+def _baseline_pct_change(s):
+    # The pandas expression _pct_change replaced: pad gaps, a/prev - 1,
+    # NaN/inf (incl. x/0) -> 0
+    p = pd.to_numeric(s, errors="coerce").astype(float).ffill().pct_change()
+    return p.replace([np.inf, -np.inf], np.nan).fillna(0).to_numpy()
+
+
+@pytest.mark.parametrize("values", [
+    [100, 95, 100, 110, 121],              # exact 5% / 10% moves
+    [0, 5, 0, 0, 3, -2, 4],                # x/0 and 0/0
+    [np.nan, 10, np.nan, np.nan, 12, 9],   # leading and inner gaps
+    ["7", "x", "8.5", None, "9"],          # non-numeric cells
+    [42],
+    [],
+])
+def test_pct_change_matches_pandas(values):
+    s = pd.Series(values, dtype=object)
+    np.testing.assert_array_equal(_pct_change(s), _baseline_pct_change(s))
+
+
+def test_pct_change_matches_pandas_on_random_ints():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        s = pd.Series(rng.integers(0, 200, size=24))
+        np.testing.assert_array_equal(_pct_change(s), _baseline_pct_change(s))
+
+
+def test_growth_bool_thresholds():
+    up, down = _growth_bool(pd.Series([100, 95, 100, 110]))
+    # 100 -> 95 is -0.050000000000000044 and 100 -> 110 is 0.10000000000000009
+    assert down.tolist() == [False, True, False, False]
+    assert up.tolist() == [False, False, False, True]
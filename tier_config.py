@@ -15,6 +15,7 @@ Used by bos_credits.py → charge_bos_run()
 Field meanings:
 - credits_per_analysis: how many credits to deduct per BOS/EA run.
 - daily_doc_cap: max documents per day (None = unlimited).
+- rate_limit_multiplier: scales the per-minute request caps in rate_limit.py.
 """
 
 TIER_CONFIG = {
@@ -24,6 +25,7 @@ TIER_CONFIG = {
     "demo": {
         "credits_per_analysis": 10,    # EA/BOS analysis cost
         "daily_doc_cap": 3,            # only 3 documents/day allowed
+        "rate_limit_multiplier": 1,
     },
 
     # --------------------------------------------------------
@@ -32,6 +34,7 @@ TIER_CONFIG = {
     "pro": {
         "credits_per_analysis": 10,    # Same BOS cost, higher freedom
         "daily_doc_cap": None,         # No daily limit
+        "rate_limit_multiplier": 2,
     },
 
     # --------------------------------------------------------
@@ -40,6 +43,7 @@ TIER_CONFIG = {
     "premium": {
         "credits_per_analysis": 5,     # Cheaper per-run cost
         "daily_doc_cap": None,
+        "rate_limit_multiplier": 4,
     },
 
     # --------------------------------------------------------
@@ -48,6 +52,7 @@ TIER_CONFIG = {
     "enterprise": {
         "credits_per_analysis": 1,     # Essentially unlimited use
         "daily_doc_cap": None,
+        "rate_limit_multiplier": 10,
     },
 }
 
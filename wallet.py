@@ -180,13 +180,15 @@ class DailyLimitReachedError(Exception):
 # ---------------------------------------------------------------------------
 
 
-def get_or_create_wallet(db: Session, user_id: int) -> CreditWallet:
+def get_or_create_wallet(db: Session, user_id: int, for_update: bool = False) -> CreditWallet:
     """
     Ensure a wallet row exists for this user.
+    With for_update=True the row is locked (SELECT ... FOR UPDATE) until commit.
     """
-    wallet = db.execute(
-        select(CreditWallet).where(CreditWallet.user_id == user_id)
-    ).scalar_one_or_none()
+    stmt = select(CreditWallet).where(CreditWallet.user_id == user_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+    wallet = db.execute(stmt).scalar_one_or_none()
 
     if wallet is None:
         wallet = CreditWallet(
@@ -306,7 +308,8 @@ def consume_credits_and_record_usage(
     if credits_required <= 0:
         raise ValueError("credits_required must be positive")
 
-    wallet = get_or_create_wallet(db, user_id)
+    # lock the wallet row so concurrent debits serialize
+    wallet = get_or_create_wallet(db, user_id, for_update=True)
     usage = _get_or_create_usage_daily(db, user_id, for_date)
 
     # 1) Daily cap (typically only for Demo)
@@ -335,6 +338,7 @@ def consume_credits_and_record_usage(
     tx = CreditTransaction(
         user_id=user_id,
         api_key_id=None,
+        delta_credits=-credits_required,   # REQUIRED by DB
         amount=-credits_required,
         reason=reason,
         gateway=gateway,
@@ -346,6 +350,51 @@ def consume_credits_and_record_usage(
     return wallet
 
 
+def refund_credits_and_usage(
+    db: Session,
+    user_id: int,
+    credits: int,
+    doc_increment: int = 1,
+    reason: str = "bos_refund",
+    gateway: str = "system",
+    metadata: Optional[Dict[str, Any]] = None,
+    for_date: Optional[dt.date] = None,
+) -> CreditWallet:
+    """
+    Undo consume_credits_and_record_usage() for a run that did not complete:
+
+    - return credits to credit_wallets and take them off lifetime_spent
+    - roll back the usage_daily counters for `for_date` (default today)
+    - insert a row into credit_transactions with `amount = +credits`
+    """
+    if credits <= 0:
+        raise ValueError("credits must be positive for refund")
+
+    wallet = get_or_create_wallet(db, user_id, for_update=True)
+    usage = _get_or_create_usage_daily(db, user_id, for_date)
+
+    wallet.balance_credits += credits
+    wallet.lifetime_spent = max(0, wallet.lifetime_spent - credits)
+
+    usage.docs_processed = max(0, usage.docs_processed - doc_increment)
+    usage.analyses_run = max(0, usage.analyses_run - 1)
+    usage.credits_spent = max(0, usage.credits_spent - credits)
+
+    tx = CreditTransaction(
+        user_id=user_id,
+        api_key_id=None,
+        delta_credits=credits,   # REQUIRED by DB
+        amount=credits,
+        reason=reason,
+        gateway=gateway,
+        gateway_payment_id=None,
+        extra_metadata=metadata or {},
+    )
+    db.add(tx)
+
+    return wallet
+
+
 def list_transactions(
     db: Session,
     user_id: int,